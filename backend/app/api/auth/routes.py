@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.api.auth.schemas import GuestLoginRequest, GuestLoginResponse, UserProfileResponse
 from app.api.auth.service import AuthService
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, security
+from app.core.security import verify_token
+from app.core.revocation import revoke_token
 from app.models.user import User
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -34,10 +37,17 @@ async def get_profile(
     return AuthService.get_user_profile(current_user)
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
     """
-    Logout endpoint (token invalidation handled on client side)
+    Logout endpoint - revokes the presented token until it expires
     """
+    payload = verify_token(credentials.credentials)
+    revoke_token(db, payload)
+    
     return {
         "success": True,
         "message": "Logged out successfully"
@@ -1,4 +1,6 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
 from app.models.user import User
 from app.core.security import create_access_token
 from app.api.auth.schemas import GuestLoginRequest, GuestLoginResponse
@@ -10,34 +12,41 @@ class AuthService:
     def guest_login(db: Session, request: GuestLoginRequest) -> GuestLoginResponse:
         """Handle guest login - create user if not exists"""
         
-        # Check if user exists
-        user = db.query(User).filter(User.phone_number == request.phone_number).first()
+        # Single-statement upsert: concurrent logins for the same phone
+        # never race into a unique-constraint error
+        stmt = insert(User).values(
+            phone_number=request.phone_number,
+            device_id=request.device_id
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.phone_number],
+            set_={
+                # Keep the stored device_id unless a new one was sent
+                "device_id": func.coalesce(stmt.excluded.device_id, User.device_id),
+                # ON CONFLICT skips the ORM onupdate, so bump it here when the device changes
+                "updated_at": case(
+                    (
+                        stmt.excluded.device_id.is_not(None)
+                        & stmt.excluded.device_id.is_distinct_from(User.device_id),
+                        func.timezone("UTC", func.now())
+                    ),
+                    else_=User.updated_at
+                )
+            }
+        ).returning(User.user_uuid)
         
-        if not user:
-            # Create new user
-            user = User(
-                phone_number=request.phone_number,
-                device_id=request.device_id
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        else:
-            # Update device_id if changed
-            if request.device_id and user.device_id != request.device_id:
-                user.device_id = request.device_id
-                db.commit()
-                db.refresh(user)
+        user_uuid = db.execute(stmt).scalar_one()
+        db.commit()
         
         # Create access token
         access_token = create_access_token(
-            data={"sub": str(user.user_uuid), "type": "user"}
+            data={"sub": str(user_uuid), "type": "user"}
         )
         
         return GuestLoginResponse(
             access_token=access_token,
-            user_uuid=user.user_uuid,
-            phone_number=user.phone_number
+            user_uuid=user_uuid,
+            phone_number=request.phone_number
         )
     
     @staticmethod
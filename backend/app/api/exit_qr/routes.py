@@ -1,30 +1,112 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.api.exit_qr.schemas import (
     ExitQRGenerateRequest,
     ExitQRResponse,
     ExitQRVerifyRequest,
-    ExitQRVerifyResponse
+    ExitQRVerifyResponse,
+    ExitQRVerifyBatchRequest,
+    ExitQRVerifyBatchResponse,
+    GateSyncRequest,
+    GateSyncResponse
 )
 from app.api.exit_qr.service import ExitQRService
-from app.core.dependencies import get_current_user, get_optional_user
+from app.core.dependencies import (
+    get_current_user,
+    get_current_staff,
+    get_current_staff_uuid,
+    get_optional_user
+)
+from app.core.pass_signing import exit_pass_signer
 from app.models.user import User
+from app.models.staff import Staff
+from app.services.gate_feed import gate_feed
 from app.config import settings
+import asyncio
+import json
+from datetime import datetime
 from typing import Optional
+from uuid import UUID
 
 router = APIRouter(prefix="/exit-qr", tags=["Exit QR"])
 
+IMAGE_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def negotiate_image_format(accept: Optional[str]) -> str:
+    """Pick png or svg from an Accept header (png when either will do)"""
+    if not accept:
+        return "png"
+    
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        
+        media_type = media_type.strip().lower()
+        if media_type in ("image/*", "*/*"):
+            fmt = "png"
+        else:
+            fmt = next((f for f, t in IMAGE_TYPES.items() if t == media_type), None)
+        if fmt and q > best_q:
+            best, best_q = fmt, q
+    
+    if best is None:
+        raise HTTPException(status_code=406, detail="Supported image types: image/png, image/svg+xml")
+    return best
+
+
 @router.post("/generate", response_model=ExitQRResponse)
 async def generate_exit_qr(
     request: ExitQRGenerateRequest,
+    include_image: bool = Query(True, description="Set false to skip the inline base64 image and use image_url"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate exit QR code after successful payment
     """
-    return ExitQRService.generate_exit_qr(db, request)
+    return ExitQRService.generate_exit_qr(db, request, include_image)
+
+@router.get("/{exit_qr_uuid}/image")
+async def get_exit_qr_image(
+    exit_qr_uuid: UUID,
+    size: int = Query(10, ge=1, le=40, description="Pixels per QR module"),
+    border: int = Query(4, ge=0, le=10, description="Quiet zone in modules"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Exit QR as a raw PNG or SVG image, negotiated via the Accept header
+    """
+    fmt = negotiate_image_format(accept)
+    image, exit_qr = ExitQRService.get_exit_qr_image(
+        db, exit_qr_uuid, current_user, fmt, size, border
+    )
+    
+    # The image of a pass never changes, so it can be cached until the pass expires
+    max_age = max(0, int((exit_qr.expires_at - datetime.utcnow()).total_seconds()))
+    etag = f'"{exit_qr.exit_qr_uuid.hex}-{fmt}-{size}-{border}"'
+    headers = {
+        "Cache-Control": f"private, max-age={max_age}, immutable",
+        "ETag": etag,
+        "Vary": "Accept, Authorization"
+    }
+    
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image, media_type=IMAGE_TYPES[fmt], headers=headers)
 
 @router.post("/verify", response_model=ExitQRVerifyResponse)
 async def verify_exit_qr(
@@ -39,6 +121,85 @@ async def verify_exit_qr(
     return ExitQRService.verify_exit_qr(db, request, staff_id)
 
 
+@router.post("/verify-batch", response_model=ExitQRVerifyBatchResponse)
+async def verify_exit_qr_batch(
+    request: ExitQRVerifyBatchRequest,
+    current_staff: Staff = Depends(get_current_staff),
+    db: Session = Depends(get_db)
+):
+    """
+    Verify passes from several gate lanes at once (staff only)
+    """
+    results = ExitQRService.verify_exit_qr_batch(
+        db, request.qr_tokens, str(current_staff.staff_uuid), request.lane
+    )
+    return {
+        "results": results,
+        "authorized": sum(1 for result in results if result["valid"])
+    }
+
+@router.get("/feed")
+async def gate_verification_feed(
+    request: Request,
+    current_staff_uuid: str = Depends(get_current_staff_uuid)
+):
+    """
+    Server-Sent Events stream of exit verifications for staff dashboards
+    Replays the most recent events, then pushes each new outcome
+    (lane, order number, status, latency) as it commits
+    """
+    backlog, queue = gate_feed.subscribe()
+    
+    async def event_stream():
+        try:
+            for event in backlog:
+                yield f"event: verification\ndata: {json.dumps(event)}\n\n"
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.GATE_FEED_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                yield f"event: verification\ndata: {json.dumps(event)}\n\n"
+        finally:
+            gate_feed.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/keys")
+async def exit_pass_keys(response: Response):
+    """
+    Public keys (JWKS) gate scanners use to verify exit passes offline
+    Empty unless QR_SIGNING_ALGORITHM is EdDSA
+    """
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    keys = [exit_pass_signer.public_jwk()] if exit_pass_signer is not None else []
+    return {"keys": keys}
+
+@router.post("/gate-sync", response_model=GateSyncResponse)
+async def gate_sync(
+    request: GateSyncRequest,
+    current_staff: Staff = Depends(get_current_staff),
+    db: Session = Depends(get_db)
+):
+    """
+    Gate scanner sync: upload passes authorized offline, download passes
+    consumed elsewhere since the last cursor
+    """
+    return ExitQRService.sync_gate(db, request, str(current_staff.staff_uuid))
+
+
 # Internal endpoint for n8n workflow (no user auth required)
 @router.post("/internal/generate", response_model=ExitQRResponse)
 async def internal_generate_exit_qr(
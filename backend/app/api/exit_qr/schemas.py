@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 
 class ExitQRGenerateRequest(BaseModel):
     order_uuid: UUID
@@ -9,7 +10,8 @@ class ExitQRResponse(BaseModel):
     exit_qr_uuid: UUID
     order_uuid: UUID
     token: str
-    qr_image: str  # Base64 encoded image
+    qr_image: Optional[str] = None  # Base64 encoded image, omitted when include_image=false
+    image_url: Optional[str] = None  # Raw PNG/SVG via GET /exit-qr/{exit_qr_uuid}/image
     expires_at: str
     order_number: str
     total_amount: float
@@ -17,14 +19,40 @@ class ExitQRResponse(BaseModel):
 
 class ExitQRVerifyRequest(BaseModel):
     qr_token: str
+    lane: Optional[str] = None  # Gate lane, shown on the live gate feed
 
 class ExitQRVerifyResponse(BaseModel):
     valid: bool
-    order_uuid: Optional[UUID]
-    order_number: Optional[str]
-    user_name: Optional[str]
-    total_amount: Optional[float]
-    items_count: Optional[int]
-    items: Optional[list]
+    order_uuid: Optional[UUID] = None
+    order_number: Optional[str] = None
+    user_name: Optional[str] = None
+    total_amount: Optional[float] = None
+    items_count: Optional[int] = None
+    items: Optional[list] = None
     message: str
     status: str  # authorized, expired, already_used, invalid
+
+class ExitQRVerifyBatchRequest(BaseModel):
+    qr_tokens: List[str]
+    lane: Optional[str] = None
+
+class ExitQRVerifyBatchResponse(BaseModel):
+    results: List[ExitQRVerifyResponse]  # Same order as qr_tokens
+    authorized: int
+
+class GateSyncRequest(BaseModel):
+    gate_id: str
+    consumed: List[UUID] = []  # Pass ids (token jti) authorized offline since the last sync
+    since: Optional[datetime] = None  # Cursor from the previous sync
+
+class GateSyncConflict(BaseModel):
+    pass_id: UUID
+    verified_by: Optional[str]
+    used_at: Optional[datetime]
+
+class GateSyncResponse(BaseModel):
+    accepted: List[UUID]
+    conflicts: List[GateSyncConflict]  # Passes another gate had already consumed
+    unknown: List[UUID]
+    used_pass_ids: List[UUID]  # Recently consumed anywhere; reject these locally
+    cursor: datetime
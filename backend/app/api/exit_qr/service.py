@@ -1,19 +1,36 @@
+from sqlalchemy import func, literal_column, select, update
 from sqlalchemy.orm import Session
 from app.models.exit_qr import ExitQR
 from app.models.order import Order
 from app.models.order_item import OrderItem
-from app.api.exit_qr.schemas import ExitQRGenerateRequest, ExitQRVerifyRequest
-from app.core.security import create_qr_token, verify_qr_token
-from app.utils.qr_generator import generate_qr_code
+from app.models.user import User
+from app.api.exit_qr.schemas import ExitQRGenerateRequest, ExitQRVerifyRequest, GateSyncRequest
+from app.core.security import create_qr_token, qr_token_digest, verify_qr_token
+from app.core.display_snapshot import decode_display_snapshot, encode_display_snapshot
+from app.utils.qr_generator import png_data_uri
+from app.services.qr_cache import qr_image_cache
+from app.services.gate_feed import gate_feed, publish_gate_events
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
+import time
+import uuid
+from types import SimpleNamespace
+from typing import List, Optional
 from uuid import UUID
 from app.config import settings
 
+# Cursors are handed back this far in the past so a consumption committed
+# while a sync was reading is picked up by the next one
+GATE_SYNC_OVERLAP = timedelta(seconds=30)
+
 class ExitQRService:
     
     @staticmethod
-    def generate_exit_qr(db: Session, request: ExitQRGenerateRequest):
+    def image_url(exit_qr_uuid) -> str:
+        return f"/api/v1/exit-qr/{exit_qr_uuid}/image"
+    
+    @staticmethod
+    def generate_exit_qr(db: Session, request: ExitQRGenerateRequest, include_image: bool = True):
         """Generate exit QR code after successful payment"""
         
         # Get order
@@ -38,13 +55,22 @@ class ExitQRService:
         ).first()
         
         if existing_qr and not existing_qr.used:
-            # Return existing QR if not used
-            qr_image = generate_qr_code(existing_qr.token)
+            # Return existing QR if not used, served from the image cache
+            qr_image = None
+            if include_image:
+                png, image_path = qr_image_cache.get_png(
+                    existing_qr.token, existing_qr.expires_at, existing_qr.qr_image_path
+                )
+                if existing_qr.qr_image_path != image_path:
+                    existing_qr.qr_image_path = image_path
+                    db.commit()
+                qr_image = png_data_uri(png)
             return {
                 "exit_qr_uuid": existing_qr.exit_qr_uuid,
                 "order_uuid": order.order_uuid,
                 "token": existing_qr.token,
                 "qr_image": qr_image,
+                "image_url": ExitQRService.image_url(existing_qr.exit_qr_uuid),
                 "expires_at": existing_qr.expires_at.isoformat(),
                 "order_number": order.order_number,
                 "total_amount": order.total_amount,
@@ -54,7 +80,10 @@ class ExitQRService:
         # Generate new token
         expires_at = datetime.utcnow() + timedelta(minutes=settings.QR_EXPIRY_MINUTES)
         
+        # The pass id travels in the token so gates can track consumption offline
+        exit_qr_uuid = uuid.uuid4()
         token_payload = {
+            "jti": str(exit_qr_uuid),
             "order_uuid": str(order.order_uuid),
             "order_number": order.order_number,
             "amount": float(order.total_amount),
@@ -63,13 +92,38 @@ class ExitQRService:
         
         token = create_qr_token(token_payload)
         
-        # Generate QR code image
-        qr_image = generate_qr_code(token)
+        # Freeze what the gate screen shows so verify needs no extra lookups
+        display_data = None
+        if settings.QR_EMBED_DISPLAY_DATA:
+            display_data = encode_display_snapshot({
+                "order_number": order.order_number,
+                "total_amount": order.total_amount,
+                "items_count": order.items_count,
+                "user_name": order.user.name or order.user.phone_number,
+                "items": [
+                    {
+                        "product_name": item.product_name,
+                        "quantity": item.quantity,
+                        "price": item.price
+                    }
+                    for item in order.order_items
+                ]
+            })
+        
+        # Generate QR code image (rendered once, then cached)
+        qr_image, image_path = None, None
+        if include_image:
+            png, image_path = qr_image_cache.get_png(token, expires_at)
+            qr_image = png_data_uri(png)
         
         # Create exit QR record
         exit_qr = ExitQR(
+            exit_qr_uuid=exit_qr_uuid,
             order_uuid=order.order_uuid,
+            token_hash=qr_token_digest(token),
             token=token,
+            qr_image_path=image_path,
+            display_data=display_data,
             expires_at=expires_at,
             used=False
         )
@@ -87,6 +141,7 @@ class ExitQRService:
             "order_uuid": order.order_uuid,
             "token": token,
             "qr_image": qr_image,
+            "image_url": ExitQRService.image_url(exit_qr.exit_qr_uuid),
             "expires_at": expires_at.isoformat(),
             "order_number": order.order_number,
             "total_amount": order.total_amount,
@@ -94,32 +149,160 @@ class ExitQRService:
         }
     
     @staticmethod
-    def verify_exit_qr(db: Session, request: ExitQRVerifyRequest, staff_id: str = None):
-        """Verify exit QR code at gate"""
+    def get_exit_qr_image(
+        db: Session,
+        exit_qr_uuid: UUID,
+        user,
+        fmt: str = "png",
+        box_size: int = 10,
+        border: int = 4
+    ):
+        """Raw image bytes of an active exit pass owned by user"""
         
-        # Verify token
-        payload = verify_qr_token(request.qr_token)
+        exit_qr = db.query(ExitQR).join(
+            Order, Order.order_uuid == ExitQR.order_uuid
+        ).filter(
+            ExitQR.exit_qr_uuid == exit_qr_uuid,
+            Order.user_uuid == user.user_uuid
+        ).first()
         
-        if not payload:
-            return {
-                "valid": False,
-                "message": "Invalid QR code",
-                "status": "invalid"
-            }
+        if not exit_qr:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Exit QR not found"
+            )
         
-        order_uuid = payload.get("order_uuid")
+        if exit_qr.used or datetime.utcnow() > exit_qr.expires_at:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Exit QR is no longer valid"
+            )
         
-        # Get exit QR record
-        exit_qr = db.query(ExitQR).filter(ExitQR.token == request.qr_token).first()
+        image = qr_image_cache.get_image(
+            exit_qr.token,
+            exit_qr.expires_at,
+            fmt=fmt,
+            box_size=box_size,
+            border=border,
+            image_path=exit_qr.qr_image_path
+        )
+        return image, exit_qr
+    
+    @staticmethod
+    def _display_columns(order_uuid_column) -> list:
+        """What the gate screen shows, read from the order, its customer and its items"""
+        items = select(
+            func.coalesce(
+                func.json_agg(func.json_build_object(
+                    "product_name", OrderItem.product_name,
+                    "quantity", OrderItem.quantity,
+                    "price", OrderItem.price
+                )),
+                literal_column("'[]'::json")
+            )
+        ).where(OrderItem.order_uuid == order_uuid_column).scalar_subquery()
         
-        if not exit_qr:
+        return [
+            Order.order_uuid,
+            Order.order_number,
+            Order.total_amount,
+            Order.items_count,
+            func.coalesce(User.name, User.phone_number).label("user_name"),
+            items.label("items")
+        ]
+    
+    @staticmethod
+    def _consume(db: Session, token_filter, staff_id: str, now: datetime):
+        """
+        Consume matching passes and fetch what the gate displays, in one statement:
+        UPDATE ... WHERE used = false AND expires_at > now RETURNING. A pass can
+        only be consumed once, however many gates scan it concurrently.
+        Display data comes from the pass's signed snapshot when it has one, else
+        from the order, its customer and its items joined onto the UPDATE
+        """
+        consume = update(ExitQR).where(
+            token_filter,
+            ExitQR.used == False,
+            ExitQR.expires_at > now
+        ).values(
+            used=True, used_at=now, verified_by=staff_id
+        )
+        
+        if settings.QR_EMBED_DISPLAY_DATA:
+            consumed = db.execute(consume.returning(
+                ExitQR.order_uuid, ExitQR.token_hash, ExitQR.qr_image_path, ExitQR.display_data
+            )).all()
+            
+            rows, missing = [], []
+            for row in consumed:
+                display = decode_display_snapshot(row.display_data)
+                if display is None:
+                    missing.append(row)
+                    continue
+                rows.append(SimpleNamespace(
+                    token_hash=row.token_hash,
+                    qr_image_path=row.qr_image_path,
+                    order_uuid=row.order_uuid,
+                    **display
+                ))
+            
+            # Passes issued before snapshots were enabled
+            if missing:
+                orders = {
+                    order.order_uuid: order._asdict()
+                    for order in db.execute(
+                        select(*ExitQRService._display_columns(Order.order_uuid)).join(
+                            User, User.user_uuid == Order.user_uuid
+                        ).where(Order.order_uuid.in_({row.order_uuid for row in missing}))
+                    ).all()
+                }
+                for row in missing:
+                    rows.append(SimpleNamespace(
+                        token_hash=row.token_hash,
+                        qr_image_path=row.qr_image_path,
+                        **orders[row.order_uuid]
+                    ))
+            return rows
+        
+        consumed = consume.returning(
+            ExitQR.order_uuid, ExitQR.token_hash, ExitQR.qr_image_path
+        ).cte("consumed")
+        
+        stmt = select(
+            consumed.c.token_hash,
+            consumed.c.qr_image_path,
+            *ExitQRService._display_columns(consumed.c.order_uuid)
+        ).select_from(consumed).join(
+            Order, Order.order_uuid == consumed.c.order_uuid
+        ).join(
+            User, User.user_uuid == Order.user_uuid
+        )
+        return db.execute(stmt).all()
+    
+    @staticmethod
+    def _authorized(row) -> dict:
+        return {
+            "valid": True,
+            "order_uuid": row.order_uuid,
+            "order_number": row.order_number,
+            "user_name": row.user_name,
+            "total_amount": row.total_amount,
+            "items_count": row.items_count,
+            "items": row.items,
+            "message": "Authorization successful. Customer can exit.",
+            "status": "authorized"
+        }
+    
+    @staticmethod
+    def _rejected(exit_qr) -> dict:
+        """Why a pass could not be consumed; exit_qr is its row, or None"""
+        if exit_qr is None:
             return {
                 "valid": False,
                 "message": "QR code not found",
                 "status": "invalid"
             }
         
-        # Check if already used
         if exit_qr.used:
             return {
                 "valid": False,
@@ -127,53 +310,209 @@ class ExitQRService:
                 "status": "already_used"
             }
         
-        # Check if expired
-        if datetime.utcnow() > exit_qr.expires_at:
-            return {
-                "valid": False,
-                "message": "QR code expired",
-                "status": "expired"
-            }
+        qr_image_cache.evict(exit_qr.token_hash, exit_qr.qr_image_path)
+        return {
+            "valid": False,
+            "message": "QR code expired",
+            "status": "expired"
+        }
+    
+    @staticmethod
+    def verify_exit_qr(db: Session, request: ExitQRVerifyRequest, staff_id: str = None):
+        """Verify exit QR code at gate"""
         
-        # Get order details
-        order = db.query(Order).filter(Order.order_uuid == order_uuid).first()
+        started = time.perf_counter()
         
-        if not order:
-            return {
-                "valid": False,
-                "message": "Order not found",
-                "status": "invalid"
-            }
+        # Signature only; the pass row decides expiry, so expired passes
+        # are reported as expired rather than invalid. Forged or garbled
+        # tokens cost no DB work and stay off the gate feed
+        if not verify_qr_token(request.qr_token, verify_exp=False):
+            gate_feed.count_forged()
+            return ExitQRService._invalid_token()
         
-        # Get order items
-        order_items = db.query(OrderItem).filter(
-            OrderItem.order_uuid == order.order_uuid
-        ).all()
+        result = ExitQRService._verify_token(db, request.qr_token, staff_id)
+        
+        # Gate dashboards hear about it when the outcome commits
+        publish_gate_events(
+            db, [result], request.lane, staff_id, (time.perf_counter() - started) * 1000
+        )
+        db.commit()
+        
+        return result
+    
+    @staticmethod
+    def _invalid_token() -> dict:
+        return {
+            "valid": False,
+            "message": "Invalid QR code",
+            "status": "invalid"
+        }
+    
+    @staticmethod
+    def _verify_token(db: Session, qr_token: str, staff_id: str = None) -> dict:
+        """Consume one pass with a checked signature, inside the caller's transaction"""
+        
+        now = datetime.utcnow()
+        token_hash = qr_token_digest(qr_token)
+        rows = ExitQRService._consume(db, ExitQR.token_hash == token_hash, staff_id, now)
+        
+        if not rows:
+            # Failure path only: find out why nothing was consumed
+            exit_qr = db.query(
+                ExitQR.used, ExitQR.token_hash, ExitQR.qr_image_path
+            ).filter(ExitQR.token_hash == token_hash).first()
+            return ExitQRService._rejected(exit_qr)
+        
+        row = rows[0]
+        
+        # A used pass is never shown again
+        qr_image_cache.evict(row.token_hash, row.qr_image_path)
+        
+        return ExitQRService._authorized(row)
+    
+    @staticmethod
+    def verify_exit_qr_batch(
+        db: Session,
+        tokens: List[str],
+        staff_id: str = None,
+        lane: Optional[str] = None
+    ):
+        """
+        Verify and consume several passes in one transaction
+        Results are returned in input order; a token repeated in the batch is
+        authorized at most once
+        """
+        
+        if len(tokens) > settings.EXIT_VERIFY_BATCH_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.EXIT_VERIFY_BATCH_MAX} passes per batch"
+            )
+        
+        started = time.perf_counter()
+        # One dict per result, so no two indexes share an object
+        results = [ExitQRService._invalid_token() for _ in tokens]
         
-        items_list = [
-            {
-                "product_name": item.product_name,
-                "quantity": item.quantity,
-                "price": item.price
+        # Signature checks are local; only genuine tokens reach the DB, which
+        # then tells expired passes apart from used ones
+        positions = {}
+        for index, token in enumerate(tokens):
+            if verify_qr_token(token, verify_exp=False):
+                positions.setdefault(qr_token_digest(token), []).append(index)
+        
+        now = datetime.utcnow()
+        consumed = {}
+        if positions:
+            consumed = {
+                bytes(row.token_hash): row
+                for row in ExitQRService._consume(
+                    db, ExitQR.token_hash.in_(list(positions)), staff_id, now
+                )
             }
-            for item in order_items
-        ]
         
-        # Mark as used
-        exit_qr.used = True
-        exit_qr.used_at = datetime.utcnow()
-        exit_qr.verified_by = staff_id
+        rejected = {}
+        remaining = [token_hash for token_hash in positions if token_hash not in consumed]
+        if remaining:
+            rejected = {
+                bytes(row.token_hash): row
+                for row in db.query(
+                    ExitQR.used, ExitQR.token_hash, ExitQR.qr_image_path
+                ).filter(ExitQR.token_hash.in_(remaining)).all()
+            }
+        
+        for token_hash, indexes in positions.items():
+            row = consumed.get(token_hash)
+            if row is not None:
+                qr_image_cache.evict(row.token_hash, row.qr_image_path)
+                results[indexes[0]] = ExitQRService._authorized(row)
+                for index in indexes[1:]:
+                    results[index] = {
+                        "valid": False,
+                        "message": "QR code already used",
+                        "status": "already_used"
+                    }
+            else:
+                result = ExitQRService._rejected(rejected.get(token_hash))
+                for index in indexes:
+                    results[index] = dict(result)
+        
+        # Forged tokens stay off the feed, as in verify_exit_qr
+        genuine = sorted(index for indexes in positions.values() for index in indexes)
+        gate_feed.count_forged(len(tokens) - len(genuine))
+        publish_gate_events(
+            db,
+            [results[index] for index in genuine],
+            lane,
+            staff_id,
+            (time.perf_counter() - started) * 1000
+        )
+        db.commit()
+        
+        return results
+    
+    @staticmethod
+    def sync_gate(db: Session, request: GateSyncRequest, staff_id: str):
+        """
+        Gate sync: record passes a gate authorized offline, and return the
+        passes consumed anywhere since the gate's cursor
+        """
+        
+        if len(request.consumed) > settings.GATE_SYNC_MAX_BATCH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.GATE_SYNC_MAX_BATCH} consumed passes per sync"
+            )
+        
+        now = datetime.utcnow()
+        gate = f"gate:{request.gate_id}:{staff_id}"
+        uploaded = set(request.consumed)
+        
+        # First consumer wins. Server time keeps used_at usable as the sync cursor
+        consumed_rows = []
+        if uploaded:
+            consumed_rows = db.execute(
+                update(ExitQR).where(
+                    ExitQR.exit_qr_uuid.in_(uploaded),
+                    ExitQR.used == False
+                ).values(
+                    used=True, used_at=now, verified_by=gate
+                ).returning(ExitQR.exit_qr_uuid, ExitQR.token_hash, ExitQR.qr_image_path)
+            ).all()
+        accepted = {row.exit_qr_uuid for row in consumed_rows}
+        
+        conflicts = []
+        rejected = uploaded - accepted
+        if rejected:
+            conflicts = db.query(
+                ExitQR.exit_qr_uuid, ExitQR.verified_by, ExitQR.used_at
+            ).filter(ExitQR.exit_qr_uuid.in_(rejected)).all()
+        known = {row.exit_qr_uuid for row in conflicts}
         
         db.commit()
         
+        for row in consumed_rows:
+            qr_image_cache.evict(row.token_hash, row.qr_image_path)
+        
+        # Only passes that could still be presented matter to a gate
+        since = request.since or now - timedelta(minutes=settings.QR_EXPIRY_MINUTES)
+        used_pass_ids = db.query(ExitQR.exit_qr_uuid).filter(
+            ExitQR.used == True,
+            ExitQR.used_at > since,
+            ExitQR.expires_at > now
+        ).all()
+        
         return {
-            "valid": True,
-            "order_uuid": order.order_uuid,
-            "order_number": order.order_number,
-            "user_name": order.user.name or order.user.phone_number,
-            "total_amount": order.total_amount,
-            "items_count": order.items_count,
-            "items": items_list,
-            "message": "Authorization successful. Customer can exit.",
-            "status": "authorized"
+            "accepted": list(accepted),
+            "conflicts": [
+                {
+                    "pass_id": row.exit_qr_uuid,
+                    "verified_by": row.verified_by,
+                    "used_at": row.used_at
+                }
+                for row in conflicts
+                if row.verified_by != gate
+            ],
+            "unknown": list(rejected - known),
+            "used_pass_ids": [row.exit_qr_uuid for row in used_pass_ids],
+            "cursor": now - GATE_SYNC_OVERLAP
         }
@@ -5,6 +5,7 @@ from app.api.orders.schemas import OrderResponse, OrderCreateResponse
 from app.api.orders.service import OrderService
 from app.core.dependencies import get_current_user
 from app.models.user import User
+from app.services.gateway_orders import gateway_order_preparer
 from uuid import UUID
 from typing import List
 
@@ -18,7 +19,13 @@ async def create_order(
     """
     Create order from current cart
     """
-    return OrderService.create_order(db, current_user)
+    result = OrderService.create_order(db, current_user)
+    
+    # Get the gateway order ready while the shopper reviews the order
+    gateway_order_preparer.schedule(
+        result["order_uuid"], result["total_amount"], current_user.user_uuid
+    )
+    return result
 
 @router.get("/{order_uuid}", response_model=OrderResponse)
 async def get_order(
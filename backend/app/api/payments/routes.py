@@ -4,13 +4,17 @@ Supports both Demo and Razorpay modes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from uuid import UUID
+from datetime import datetime
+import asyncio
+import hashlib
 import json
-import httpx
 
-from app.database import get_db
-from app.core.dependencies import get_current_user
+from app.database import get_db, SessionLocal
+from app.core.dependencies import get_current_user, get_current_user_uuid
 from app.models.user import User
 from app.models.order import Order
 from app.models.payment import Payment
@@ -25,7 +29,16 @@ from app.config import settings
 
 # Import payment services
 from app.services.demo_payment import demo_payment_service
+from app.services.gateway_orders import gateway_order_preparer
 from app.services.razorpay_service import razorpay_service
+from app.services.outbox import enqueue_event
+from app.services.webhook_dedupe import webhook_deduplicator
+from app.services.webhook_queue import webhook_queue
+from app.services.payment_events import (
+    payment_event_broker,
+    publish_payment_status,
+    TERMINAL_STATUSES
+)
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
@@ -76,9 +89,22 @@ async def initiate_payment(
             status="pending"
         )
         db.add(payment)
-        db.commit()
+        try:
+            db.commit()
+        except Exception:
+            demo_payment_service.discard_payment(demo_response.transaction_id)
+            raise
         db.refresh(payment)
         
+        # Simulated gateway completes the payment in the background
+        demo_payment_service.schedule_completion(
+            transaction_id=demo_response.transaction_id,
+            order_uuid=str(order.order_uuid),
+            payment_uuid=str(payment.payment_uuid),
+            amount=float(order.total_amount),
+            payment_method=request.payment_method
+        )
+        
         return PaymentInitiateResponse(
             payment_uuid=str(payment.payment_uuid),
             order_uuid=str(order.order_uuid),
@@ -96,13 +122,9 @@ async def initiate_payment(
     elif payment_mode == "razorpay":
         # Razorpay payment - production flow
         try:
-            razorpay_order = razorpay_service.create_order(
-                order_uuid=str(order.order_uuid),
-                amount=float(order.total_amount),
-                notes={
-                    "order_uuid": str(order.order_uuid),
-                    "user_uuid": str(current_user.user_uuid)
-                }
+            # Usually prepared in the background when the order was placed
+            razorpay_order_id = await gateway_order_preparer.get_or_create(
+                order, current_user.user_uuid
             )
             
             # Create payment record
@@ -111,7 +133,7 @@ async def initiate_payment(
                 amount=order.total_amount,
                 payment_method=request.payment_method,
                 payment_provider="razorpay",
-                transaction_id=razorpay_order.razorpay_order_id,
+                transaction_id=razorpay_order_id,
                 status="pending"
             )
             db.add(payment)
@@ -122,17 +144,19 @@ async def initiate_payment(
                 payment_uuid=str(payment.payment_uuid),
                 order_uuid=str(order.order_uuid),
                 amount=float(order.total_amount),
-                currency=razorpay_order.currency,
+                currency="INR",
                 payment_method=request.payment_method,
                 payment_url=None,  # Razorpay uses SDK, not direct URL
                 qr_code=None,
                 provider="razorpay",
-                provider_payment_id=razorpay_order.razorpay_order_id,
-                razorpay_key_id=razorpay_order.key_id,
+                provider_payment_id=razorpay_order_id,
+                razorpay_key_id=razorpay_service.key_id,
                 expires_at=None,
                 status="pending"
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -150,11 +174,15 @@ async def initiate_payment(
 async def payment_webhook(
     request: Request,
     x_razorpay_signature: Optional[str] = Header(None),
+    x_razorpay_event_id: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     Handle payment webhook from gateway
     Supports both demo and Razorpay webhooks
+    Verified events are queued and acknowledged immediately; a background
+    worker applies them in order per order_uuid. Duplicate deliveries of the
+    same event are acknowledged without reprocessing
     """
     
     # Get raw body
@@ -182,12 +210,73 @@ async def payment_webhook(
         if not is_valid:
             raise HTTPException(status_code=400, detail="Invalid signature")
         
-        # Process Razorpay webhook
-        return await process_razorpay_webhook(data, db)
+        # Retries of one event share an id; fall back to the body digest
+        event_id = f"razorpay:{x_razorpay_event_id or hashlib.sha256(body).hexdigest()}"
+        provider = "razorpay"
+        notes = data.get("payload", {}).get("payment", {}).get("entity", {}).get("notes", {})
+        order_uuid = notes.get("order_uuid")
     
     else:
-        # Demo webhook
-        return await process_demo_webhook(data, db)
+        # Demo webhook (deduplicated when the simulator sends an event_id)
+        event_id = f"demo:{data['event_id']}" if data.get("event_id") else None
+        provider = "demo"
+        order_uuid = data.get("order_uuid")
+    
+    return accept_webhook(db, provider, body_str, event_id, order_uuid)
+
+
+def accept_webhook(
+    db: Session,
+    provider: str,
+    body: str,
+    event_id: Optional[str],
+    order_uuid: Optional[str]
+) -> dict:
+    """Queue a verified raw event for the background workers"""
+    
+    if event_id and webhook_deduplicator.seen(event_id):
+        return {"success": True, "message": "Duplicate event ignored"}
+    
+    # Store the raw event and ack; processing happens off the request path
+    webhook_queue.enqueue(
+        db,
+        provider=provider,
+        body=body,
+        event_id=event_id,
+        order_uuid=str(order_uuid) if order_uuid else None
+    )
+    
+    return {"success": True, "message": "Webhook accepted"}
+
+
+def apply_queued_webhook(db: Session, provider: str, event_id: Optional[str], data: dict):
+    """Apply one event drained from the webhook queue; runs on a queue worker thread"""
+    handler = process_razorpay_webhook if provider == "razorpay" else process_demo_webhook
+    return process_webhook_once(db, event_id, provider, handler, data)
+
+
+webhook_queue.set_processor(apply_queued_webhook)
+
+
+def process_webhook_once(db: Session, event_id: Optional[str], provider: str, handler, data: dict):
+    """
+    Run a webhook handler at most once per gateway event id
+    The event id is claimed in the same transaction the handler commits,
+    so a failed run leaves the event free to be retried
+    """
+    
+    if event_id is None:
+        return handler(data, db)
+    
+    if webhook_deduplicator.seen(event_id):
+        return {"success": True, "message": "Duplicate event ignored"}
+    
+    if not webhook_deduplicator.claim(db, event_id, provider):
+        return {"success": True, "message": "Duplicate event ignored"}
+    
+    result = handler(data, db)
+    webhook_deduplicator.remember(event_id)
+    return result
 
 
 # COMMENTED OUT - Old process_demo_webhook function (replaced below)
@@ -235,9 +324,8 @@ async def payment_webhook(
 #     }
 
 # NEW - Updated process_demo_webhook with DB commit BEFORE n8n trigger
-async def process_demo_webhook(data: dict, db: Session):
-    """Process demo payment webhook and trigger n8n"""
-    from datetime import datetime
+def process_demo_webhook(data: dict, db: Session):
+    """Process demo payment webhook and queue the n8n event"""
     
     order_uuid = data.get("order_uuid")
     payment_uuid = data.get("payment_uuid")
@@ -261,29 +349,39 @@ async def process_demo_webhook(data: dict, db: Session):
             payment.status = "success"
             payment.upi_txn_id = data.get("provider_reference")
         
-        # Commit to database BEFORE calling n8n (critical change!)
-        db.commit()
+        # Queue the n8n event in the same transaction as the status change
+        enqueue_event(db, "payment_success", {
+            "order_uuid": str(order_uuid),
+            "payment_uuid": str(payment_uuid) if payment_uuid else None,
+            "status": "success",
+            "amount": float(order.total_amount),
+            "timestamp": datetime.utcnow().isoformat(),
+            "user_uuid": str(order.user_uuid)
+        })
         
-        # NOW trigger n8n workflow after DB is committed
-        if settings.N8N_ENABLED and settings.N8N_WEBHOOK_URL:
-            # Prepare enhanced webhook payload
-            webhook_payload = {
-                "order_uuid": str(order_uuid),
-                "payment_uuid": str(payment_uuid) if payment_uuid else None,
-                "status": "success",
-                "amount": float(order.total_amount),
-                "timestamp": datetime.utcnow().isoformat(),
-                "user_uuid": str(order.user_uuid)
-            }
-            await trigger_n8n_webhook(webhook_payload)
+        if payment:
+            publish_payment_status(db, payment.payment_uuid, order_uuid, "success", order.status)
+        
+        db.commit()
     
     else:
+        # A failed attempt reported after the payment succeeded is stale
+        if order.status in ("paid", "verified"):
+            # Commit anyway so the event id claim sticks
+            db.commit()
+            return {
+                "success": True,
+                "message": "Stale failure ignored",
+                "order_status": order.status
+            }
+        
         # Payment failed
         order.status = "payment_failed"
         
         payment = db.query(Payment).filter(Payment.order_uuid == order_uuid).first()
         if payment:
             payment.status = "failed"
+            publish_payment_status(db, payment.payment_uuid, order_uuid, "failed", order.status)
         
         db.commit()
     
@@ -294,7 +392,34 @@ async def process_demo_webhook(data: dict, db: Session):
     }
 
 
-async def process_razorpay_webhook(data: dict, db: Session):
+def _accept_demo_webhook(data: dict) -> dict:
+    db = SessionLocal()
+    try:
+        event_id = data.get("event_id")
+        return accept_webhook(
+            db,
+            "demo",
+            json.dumps(data),
+            f"demo:{event_id}" if event_id else None,
+            data.get("order_uuid")
+        )
+    finally:
+        db.close()
+
+
+async def deliver_demo_webhook(data: dict):
+    """
+    Deliver a webhook from the simulated gateway
+    Goes through the same dedupe and per-order queue as POST /payments/webhook,
+    so duplicate and out-of-order storms exercise the real ingest path
+    """
+    await asyncio.to_thread(_accept_demo_webhook, data)
+
+
+demo_payment_service.set_webhook_handler(deliver_demo_webhook)
+
+
+def process_razorpay_webhook(data: dict, db: Session):
     """Process Razorpay payment webhook"""
     
     event = data.get("event")
@@ -326,20 +451,20 @@ async def process_razorpay_webhook(data: dict, db: Session):
             payment.status = "success"
             payment.upi_txn_id = payment_id
         
-        db.commit()
+        enqueue_event(db, "payment_success", {
+            "order_uuid": str(order_uuid),
+            "payment_uuid": str(payment.payment_uuid) if payment else None,
+            "payment_id": payment_id,
+            "status": "success",
+            "amount": payload.get("amount", 0) / 100,
+            "timestamp": datetime.utcnow().isoformat(),
+            "user_uuid": str(order.user_uuid)
+        })
         
-        # Trigger n8n webhook if enabled (with enhanced payload)
-        if settings.N8N_ENABLED and settings.N8N_WEBHOOK_URL:
-            from datetime import datetime
-            await trigger_n8n_webhook({
-                "order_uuid": str(order_uuid),
-                "payment_uuid": str(payment.payment_uuid) if payment else None,
-                "payment_id": payment_id,
-                "status": "success",
-                "amount": payload.get("amount", 0) / 100,
-                "timestamp": datetime.utcnow().isoformat(),
-                "user_uuid": str(order.user_uuid)
-            })
+        if payment:
+            publish_payment_status(db, payment.payment_uuid, order_uuid, "success", order.status)
+        
+        db.commit()
         
         return {"success": True, "message": "Payment captured"}
     
@@ -351,13 +476,27 @@ async def process_razorpay_webhook(data: dict, db: Session):
         if order_uuid:
             order = db.query(Order).filter(Order.order_uuid == order_uuid).first()
             if order:
-                order.status = "payment_failed"
-                
                 payment = db.query(Payment).filter(
                     Payment.order_uuid == order.order_uuid
                 ).first()
+                
+                # Razorpay often delivers an earlier failed attempt after the
+                # capture; the queue keeps arrival order, not attempt order
+                if order.status in ("paid", "verified") or (
+                    payment and payment.status == "success"
+                ):
+                    # Commit anyway so the event id claim sticks
+                    db.commit()
+                    return {
+                        "success": True,
+                        "message": "Stale failure ignored",
+                        "order_status": order.status
+                    }
+                
+                order.status = "payment_failed"
                 if payment:
                     payment.status = "failed"
+                    publish_payment_status(db, payment.payment_uuid, order_uuid, "failed", order.status)
                 
                 db.commit()
         
@@ -366,58 +505,6 @@ async def process_razorpay_webhook(data: dict, db: Session):
     return {"success": True, "message": "Event processed"}
 
 
-# COMMENTED OUT - Old trigger_n8n_webhook function (replaced below)
-# async def trigger_n8n_webhook(data: dict):
-#     """Trigger n8n workflow via webhook"""
-#     try:
-#         async with httpx.AsyncClient() as client:
-#             await client.post(
-#                 settings.N8N_WEBHOOK_URL,
-#                 json=data,
-#                 timeout=10.0
-#             )
-#     except Exception as e:
-#         print(f"Failed to trigger n8n webhook: {e}")
-
-# NEW - Enhanced trigger_n8n_webhook with detailed logging and error handling
-from datetime import datetime
-
-async def trigger_n8n_webhook(data: dict):
-    """Trigger n8n workflow via webhook with detailed logging"""
-    try:
-        print(f"🔔 Triggering n8n webhook for order {data.get('order_uuid')}")
-        print(f"📤 Sending to n8n: {settings.N8N_WEBHOOK_URL}")
-        print(f"📦 Payload: {data}")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.N8N_WEBHOOK_URL,
-                json=data,  # CRITICAL: Use json= not data=
-                headers={
-                    "Content-Type": "application/json"
-                },
-                timeout=30.0  # Increased timeout for n8n processing
-            )
-            
-            print(f"✅ n8n response status: {response.status_code}")
-            print(f"✅ n8n response: {response.text}")
-            
-            if response.status_code == 200:
-                print(f"✅ n8n workflow triggered successfully")
-            else:
-                print(f"⚠️  n8n returned status {response.status_code}")
-                
-    except httpx.TimeoutException:
-        print(f"⚠️  n8n webhook timeout - workflow may still be processing")
-    except httpx.RequestError as e:
-        print(f"⚠️  n8n webhook request error: {e}")
-    except Exception as e:
-        print(f"⚠️  Unexpected n8n error: {e}")
-    
-    # IMPORTANT: Don't fail payment if n8n fails
-    # Payment already succeeded and committed to DB
-
-
 @router.post("/verify-razorpay")
 async def verify_razorpay_payment(
     request: PaymentVerifyRequest,
@@ -456,20 +543,21 @@ async def verify_razorpay_payment(
     if order:
         order.status = "paid"
     
-    db.commit()
+    enqueue_event(db, "payment_success", {
+        "order_uuid": str(payment.order_uuid),
+        "payment_uuid": str(payment.payment_uuid),
+        "payment_id": request.razorpay_payment_id,
+        "status": "success",
+        "amount": float(payment.amount),
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_uuid": str(order.user_uuid) if order else None
+    })
+    
+    publish_payment_status(
+        db, payment.payment_uuid, payment.order_uuid, "success", order.status if order else None
+    )
     
-    # Trigger n8n webhook if enabled (with enhanced payload)
-    if settings.N8N_ENABLED and settings.N8N_WEBHOOK_URL:
-        from datetime import datetime
-        await trigger_n8n_webhook({
-            "order_uuid": str(payment.order_uuid),
-            "payment_uuid": str(payment.payment_uuid),
-            "payment_id": request.razorpay_payment_id,
-            "status": "success",
-            "amount": float(payment.amount),
-            "timestamp": datetime.utcnow().isoformat(),
-            "user_uuid": str(order.user_uuid) if order else None
-        })
+    db.commit()
     
     return {
         "success": True,
@@ -509,6 +597,90 @@ async def get_payment_status(
     )
 
 
+@router.get("/{payment_uuid}/events")
+async def stream_payment_status(
+    payment_uuid: UUID,
+    request: Request,
+    current_user_uuid: str = Depends(get_current_user_uuid)
+):
+    """
+    Server-Sent Events stream of payment status changes
+    Sends the current status, then pushes each committed transition until
+    the payment succeeds or fails. Replaces polling GET /payments/{payment_uuid}
+    """
+    
+    # Subscribe before reading the initial state: the listener drops
+    # transitions for payments nobody is subscribed to, so one committed
+    # between the read and the subscribe would otherwise be lost
+    key = str(payment_uuid)
+    queue = payment_event_broker.subscribe(key)
+    
+    try:
+        # One short-lived session for the initial state; the stream itself holds no DB connection
+        db = SessionLocal()
+        try:
+            row = db.query(Payment, Order.user_uuid, Order.status).join(
+                Order, Order.order_uuid == Payment.order_uuid
+            ).filter(Payment.payment_uuid == payment_uuid).first()
+        finally:
+            db.close()
+        
+        if not row:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        
+        payment, owner_uuid, order_status = row
+        if str(owner_uuid) != current_user_uuid:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    except BaseException:
+        payment_event_broker.unsubscribe(key, queue)
+        raise
+    
+    initial = {
+        "payment_uuid": str(payment.payment_uuid),
+        "order_uuid": str(payment.order_uuid),
+        "status": payment.status,
+        "order_status": order_status
+    }
+    
+    async def event_stream():
+        try:
+            yield f"event: status\ndata: {json.dumps(initial)}\n\n"
+            if initial["status"] in TERMINAL_STATUSES:
+                return
+            
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.PAYMENT_EVENTS_MAX_STREAM_SECONDS
+            while loop.time() < deadline:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.PAYMENT_EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                # Transitions queued before the read are already in the initial state
+                if (event["status"], event.get("order_status")) == (
+                    initial["status"], initial["order_status"]
+                ):
+                    continue
+                
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            payment_event_broker.unsubscribe(key, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/demo/complete/{order_uuid}")
 async def demo_complete_payment(
     order_uuid: str,
@@ -542,19 +714,19 @@ async def demo_complete_payment(
     if payment:
         payment.status = "success"
     
-    db.commit()
+    enqueue_event(db, "payment_success", {
+        "order_uuid": str(order_uuid),
+        "payment_uuid": str(payment.payment_uuid) if payment else None,
+        "status": "success",
+        "amount": float(order.total_amount),
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_uuid": str(order.user_uuid)
+    })
     
-    # Trigger n8n webhook if enabled (with enhanced payload)
-    if settings.N8N_ENABLED and settings.N8N_WEBHOOK_URL:
-        from datetime import datetime
-        await trigger_n8n_webhook({
-            "order_uuid": str(order_uuid),
-            "payment_uuid": str(payment.payment_uuid) if payment else None,
-            "status": "success",
-            "amount": float(order.total_amount),
-            "timestamp": datetime.utcnow().isoformat(),
-            "user_uuid": str(order.user_uuid)
-        })
+    if payment:
+        publish_payment_status(db, payment.payment_uuid, order_uuid, "success", order.status)
+    
+    db.commit()
     
     return {
         "success": True,
@@ -6,8 +6,8 @@ from app.api.payments.schemas import PaymentInitiateRequest, PaymentWebhookReque
 from fastapi import HTTPException, status
 from datetime import datetime
 from uuid import UUID
-import httpx
 from app.config import settings
+from app.services.outbox import enqueue_event
 
 class PaymentService:
     
@@ -117,24 +117,15 @@ class PaymentService:
                 if product:
                     product.stock -= item.quantity
             
-            # Trigger n8n workflow
-            try:
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        settings.N8N_WEBHOOK_URL,
-                        json={
-                            "event": "payment_success",
-                            "order_uuid": str(order.order_uuid),
-                            "order_number": order.order_number,
-                            "amount": float(order.total_amount),
-                            "user_uuid": str(order.user_uuid),
-                            "transaction_id": request.transaction_id
-                        },
-                        timeout=5.0
-                    )
-            except Exception as e:
-                print(f"n8n webhook failed: {e}")
-                # Don't fail the payment if webhook fails
+            # Queue n8n workflow trigger in the same transaction
+            enqueue_event(db, "payment_success", {
+                "event": "payment_success",
+                "order_uuid": str(order.order_uuid),
+                "order_number": order.order_number,
+                "amount": float(order.total_amount),
+                "user_uuid": str(order.user_uuid),
+                "transaction_id": request.transaction_id
+            })
         
         elif request.status == "failed":
             order.status = "failed"
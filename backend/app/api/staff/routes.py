@@ -19,7 +19,7 @@ async def staff_login(
     """
     Staff login endpoint
     """
-    return StaffService.login(db, request)
+    return await StaffService.login(db, request)
 
 @router.post("/register", response_model=StaffResponse)
 async def create_staff(
@@ -29,4 +29,4 @@ async def create_staff(
     """
     Create new staff member (should be admin-only in production)
     """
-    return StaffService.create_staff(db, request)
+    return await StaffService.create_staff(db, request)
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
 from app.models.staff import Staff
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import (
+    hash_password_async,
+    verify_and_update_password,
+    create_access_token
+)
 from app.api.staff.schemas import StaffLoginRequest, StaffCreateRequest
 from fastapi import HTTPException, status
 from datetime import datetime
@@ -8,12 +12,22 @@ from datetime import datetime
 class StaffService:
     
     @staticmethod
-    def login(db: Session, request: StaffLoginRequest):
+    async def login(db: Session, request: StaffLoginRequest):
         """Staff login"""
         
         staff = db.query(Staff).filter(Staff.email == request.email).first()
         
-        if not staff or not verify_password(request.password, staff.password_hash):
+        if not staff:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid email or password"
+            )
+        
+        valid, new_hash = await verify_and_update_password(
+            request.password, staff.password_hash
+        )
+        
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
@@ -25,6 +39,10 @@ class StaffService:
                 detail="Staff account is inactive"
             )
         
+        # Transparently rehash if the configured bcrypt cost changed
+        if new_hash:
+            staff.password_hash = new_hash
+        
         # Update last login
         staff.last_login = datetime.utcnow()
         db.commit()
@@ -48,7 +66,7 @@ class StaffService:
         }
     
     @staticmethod
-    def create_staff(db: Session, request: StaffCreateRequest):
+    async def create_staff(db: Session, request: StaffCreateRequest):
         """Create new staff member"""
         
         # Check if email exists
@@ -60,7 +78,7 @@ class StaffService:
             )
         
         # Hash password
-        password_hash = hash_password(request.password)
+        password_hash = await hash_password_async(request.password)
         
         staff = Staff(
             email=request.email,
@@ -9,41 +9,117 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRY_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 10000  # Verified tokens kept in memory, 0 disables
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_SYNC_SECONDS: int = 5  # How often workers pull logouts from the DB
+    
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32  # In-flight hash jobs before returning 503
     
     # QR Code
     QR_SECRET: str
     QR_EXPIRY_MINUTES: int = 10
+    QR_EMBED_DISPLAY_DATA: bool = True  # Snapshot gate display data onto the pass
+    QR_TOKEN_FORMAT: str = "jwt"  # "jwt", or "compact" for smaller QR codes (online verification only)
+    QR_SIGNING_ALGORITHM: str = "HS256"  # "EdDSA" lets gates verify passes offline
+    QR_SIGNING_PRIVATE_KEY: str = ""  # Ed25519 PEM or base64url 32-byte seed
+    QR_SIGNING_KEY_ID: str = "exit-pass-1"
+    GATE_SYNC_MAX_BATCH: int = 500  # Consumed pass ids accepted per gate sync
+    EXIT_VERIFY_BATCH_MAX: int = 50  # Passes per /exit-qr/verify-batch call
+    GATE_FEED_BUFFER_SIZE: int = 200  # Recent verifications replayed to new dashboards
+    GATE_FEED_HEARTBEAT_SECONDS: float = 15.0
+    QR_CACHE_SIZE: int = 1000  # Rendered exit QR images kept in memory
+    QR_CACHE_DIR: str = "storage/exit_qr"  # On-disk copies referenced by qr_image_path
+    QR_CACHE_PRUNE_SECONDS: int = 300
     
     # Payment Mode: "demo" or "razorpay"
     PAYMENT_MODE: str = "demo"
     
-    # Demo Payment Settings
-    DEMO_PAYMENT_DELAY_SECONDS: int = 3
+    # Demo Payment Settings (gateway simulator)
+    DEMO_PAYMENT_DELAY_SECONDS: float = 3  # Median webhook latency
+    DEMO_PAYMENT_DELAY_P99_SECONDS: float = 0  # 0 = fixed delay, else lognormal tail
     DEMO_FAILURE_RATE: int = 0  # 0-100 percentage
+    DEMO_TIMEOUT_RATE: int = 0  # 0-100, webhook never delivered
+    DEMO_DUPLICATE_RATE: int = 0  # 0-100, webhook delivered twice
+    DEMO_OUT_OF_ORDER_RATE: int = 0  # 0-100, stale failed attempt arrives after the outcome
+    DEMO_MAX_WEBHOOKS_PER_SECOND: float = 0  # 0 = unlimited
+    
+    # Reconciliation of payments stuck in pending
+    RECONCILIATION_ENABLED: bool = True
+    RECONCILIATION_INTERVAL_SECONDS: int = 300
+    RECONCILIATION_GRACE_SECONDS: int = 600  # Leave recent payments to their webhook
+    RECONCILIATION_BATCH_SIZE: int = 100
+    RECONCILIATION_CONCURRENCY: int = 10  # Parallel gateway lookups
+    
+    # Expiry sweeper
+    SWEEPER_ENABLED: bool = True
+    SWEEPER_INTERVAL_SECONDS: int = 60
+    SWEEPER_BATCH_SIZE: int = 500  # Rows per transaction
+    SWEEPER_MAX_BATCHES: int = 20  # Per task per run
+    SWEEPER_RETENTION_HOURS: int = 168  # Expired passes, processed webhooks, delivered outbox events
+    CART_TTL_HOURS: int = 72  # Carts untouched this long are dropped
+    
+    # Payment status streams (SSE)
+    PAYMENT_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    PAYMENT_EVENTS_MAX_STREAM_SECONDS: float = 600.0
     
     # Razorpay Settings
     RAZORPAY_KEY_ID: str = ""
     RAZORPAY_KEY_SECRET: str = ""
     RAZORPAY_WEBHOOK_SECRET: str = ""
+    WEBHOOK_DEDUPE_CACHE_SIZE: int = 50000  # Recent gateway event ids kept in memory
+    WEBHOOK_QUEUE_WORKERS: int = 8
+    WEBHOOK_QUEUE_BATCH_SIZE: int = 50
+    WEBHOOK_QUEUE_POLL_SECONDS: float = 1.0
+    WEBHOOK_QUEUE_MAX_ATTEMPTS: int = 10
+    RAZORPAY_API_BASE_URL: str = "https://api.razorpay.com/v1"  # Point at a stand-in server for testing
+    RAZORPAY_TIMEOUT_SECONDS: float = 10.0  # Order creation and refunds
+    RAZORPAY_FETCH_TIMEOUT_SECONDS: float = 5.0  # Status lookups
+    RAZORPAY_MAX_RETRIES: int = 2  # Retries for idempotent calls
+    RAZORPAY_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    RAZORPAY_CIRCUIT_RESET_SECONDS: float = 30.0
+    GATEWAY_ORDER_PREPARE_ENABLED: bool = True  # Create the Razorpay order when the order is placed
+    GATEWAY_ORDER_WAIT_SECONDS: float = 2.0  # How long initiate waits for an in-flight preparation
     
     # Legacy payment keys (for backward compatibility)
     PAYMENT_KEY: str = ""
     PAYMENT_SECRET: str = ""
     PAYMENT_WEBHOOK_SECRET: str = ""
     
+    # Rate limiting ("<requests>/<seconds>" per user, device and IP bucket)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_GUEST_LOGIN: str = "10/60"
+    RATE_LIMIT_PRODUCT_SCAN: str = "120/60"
+    RATE_LIMIT_EXIT_VERIFY: str = "60/60"
+    RATE_LIMIT_EXIT_VERIFY_BATCH: str = "20/60"
+    
     # n8n
     N8N_WEBHOOK_URL: str = ""
     N8N_ENABLED: bool = True
     INTERNAL_API_SECRET: str = "n8n-internal-secret-key"
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_SECONDS: float = 2.0
+    OUTBOX_MAX_ATTEMPTS: int = 8  # Then the event is dead-lettered
+    OUTBOX_DELIVERY_TIMEOUT_SECONDS: float = 30.0
     
     # AI Service
     AI_SERVICE_ENABLED: bool = False
     AI_SERVICE_URL: str = "http://localhost:8001"
+    AI_SERVICE_TIMEOUT_SECONDS: float = 10.0
+    
+    # Shared outbound HTTP pools (one per upstream)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP2_ENABLED: bool = True  # Used when the h2 package is installed
     
     # App
     APP_NAME: str = "Smart Checkout System"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = True
+    METRICS_TOKEN: str = ""  # Bearer token for scrapers; staff tokens always work
     
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
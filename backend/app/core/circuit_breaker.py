@@ -0,0 +1,74 @@
+"""
+Circuit breaker for upstream services
+Fails fast while an upstream is degraded instead of tying up requests
+on calls that are going to time out anyway
+"""
+
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures
+    open -> half_open after `reset_timeout` seconds (one trial call allowed)
+    half_open -> closed on success, back to open on failure
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call should not be attempted"""
+        if self.state == "closed":
+            return
+
+        elapsed = time.monotonic() - self.opened_at
+        if self.state == "open" and elapsed >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial_in_flight = False
+
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial that ended without an outcome, e.g. cancelled"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected
+        }
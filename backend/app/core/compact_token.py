@@ -0,0 +1,66 @@
+"""
+Compact Exit Pass Tokens
+A JWT exit pass is ~250 characters of mixed-case base64, which forces a
+large QR version encoded in byte mode. The compact format packs only what
+the server needs into 31 bytes and encodes them as unpadded base32, which
+QR codes store in the denser alphanumeric mode:
+
+    version (1) | pass id (16, the exit_qr_uuid) | expiry (4, unix seconds) | HMAC-SHA256 (10)
+
+The MAC uses QR_SECRET, so compact passes are verified online; use
+EdDSA JWTs when gates have to verify passes offline.
+"""
+
+import base64
+import hashlib
+import hmac
+import struct
+import time
+import uuid
+from typing import Optional
+
+from app.config import settings
+
+VERSION = 1
+MAC_BYTES = 10
+_BODY = struct.Struct(">B16sI")
+
+
+def _mac(body: bytes) -> bytes:
+    return hmac.new(settings.QR_SECRET.encode("utf-8"), body, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def encode_compact_token(pass_id: uuid.UUID, expires_at: int) -> str:
+    """Compact token for a pass expiring at a unix timestamp"""
+    body = _BODY.pack(VERSION, pass_id.bytes, expires_at)
+    return base64.b32encode(body + _mac(body)).decode("ascii").rstrip("=")
+
+
+def decode_compact_token(token: str, verify_exp: bool = True) -> Optional[dict]:
+    """Claims of a valid (and, with verify_exp, unexpired) compact token, else None"""
+    try:
+        raw = base64.b32decode(token.upper() + "=" * (-len(token) % 8))
+    except ValueError:
+        return None
+
+    if len(raw) != _BODY.size + MAC_BYTES:
+        return None
+
+    body, mac = raw[:_BODY.size], raw[_BODY.size:]
+    if not hmac.compare_digest(_mac(body), mac):
+        return None
+
+    version, pass_id, expires_at = _BODY.unpack(body)
+    if version != VERSION or (verify_exp and expires_at < time.time()):
+        return None
+
+    return {
+        "jti": str(uuid.UUID(bytes=pass_id)),
+        "exp": expires_at,
+        "type": "exit_qr"
+    }
+
+
+def is_compact_token(token: str) -> bool:
+    # JWS compact serialization always contains dots; base32 never does
+    return "." not in token
@@ -2,8 +2,11 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
+import hmac
+from app.config import settings
 from app.database import get_db
 from app.core.security import verify_token
+from app.core.revocation import revocation_list
 from app.models.user import User
 from app.models.staff import Staff
 
@@ -17,7 +20,7 @@ async def get_current_user(
     token = credentials.credentials
     payload = verify_token(token)
     
-    if payload is None:
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
@@ -39,6 +42,65 @@ async def get_current_user(
     
     return user
 
+async def get_current_user_uuid(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> str:
+    """
+    Authenticated user id from the token alone, without a DB session
+    For long-lived requests (streams) that must not pin a pooled connection
+    """
+    payload = verify_token(credentials.credentials)
+    
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    user_uuid = payload.get("sub")
+    if user_uuid is None or payload.get("type") != "user":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    return user_uuid
+
+async def get_current_staff_uuid(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> str:
+    """
+    Authenticated staff id from the token alone, without a DB session
+    For long-lived requests (streams) that must not pin a pooled connection
+    """
+    payload = verify_token(credentials.credentials)
+    
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    staff_uuid = payload.get("sub")
+    if staff_uuid is None or payload.get("role") != "staff":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid staff credentials"
+        )
+    
+    return staff_uuid
+
+async def require_metrics_access(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> None:
+    """Metrics are for operators: the METRICS_TOKEN scraper token, or a staff token"""
+    if settings.METRICS_TOKEN and hmac.compare_digest(
+        credentials.credentials.encode("utf-8"), settings.METRICS_TOKEN.encode("utf-8")
+    ):
+        return
+    
+    await get_current_staff_uuid(credentials)
+
 async def get_current_staff(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -47,7 +109,7 @@ async def get_current_staff(
     token = credentials.credentials
     payload = verify_token(token)
     
-    if payload is None:
+    if payload is None or revocation_list.is_revoked(payload.get("jti")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
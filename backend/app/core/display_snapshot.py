@@ -0,0 +1,71 @@
+"""
+Gate Display Snapshots
+What the gate screen shows for a pass (customer, items, total) is frozen
+when the pass is issued and stored on the ExitQR row, so verification can
+return it from the consumed row without touching orders, items or users.
+
+Blob layout: version (1) | zlib(compact JSON) | HMAC-SHA256 (16)
+The MAC keeps a tampered row from putting the wrong basket on the screen.
+"""
+
+import hashlib
+import hmac
+import json
+import zlib
+from typing import Optional
+
+from app.config import settings
+
+VERSION = 1
+MAC_BYTES = 16
+
+
+def _mac(body: bytes) -> bytes:
+    return hmac.new(
+        settings.QR_SECRET.encode("utf-8"), b"gate-display:" + body, hashlib.sha256
+    ).digest()[:MAC_BYTES]
+
+
+def encode_display_snapshot(display: dict) -> bytes:
+    """Pack order_number, total_amount, items_count, user_name and items"""
+    compact = {
+        "o": display["order_number"],
+        "t": display["total_amount"],
+        "c": display["items_count"],
+        "u": display["user_name"],
+        "i": [
+            [item["product_name"], item["quantity"], item["price"]]
+            for item in display["items"]
+        ]
+    }
+    body = bytes([VERSION]) + zlib.compress(
+        json.dumps(compact, separators=(",", ":")).encode("utf-8"), 9
+    )
+    return body + _mac(body)
+
+
+def decode_display_snapshot(blob: Optional[bytes]) -> Optional[dict]:
+    """The display dict of a valid snapshot, else None"""
+    if not blob or len(blob) <= MAC_BYTES + 1:
+        return None
+
+    blob = bytes(blob)
+    body, mac = blob[:-MAC_BYTES], blob[-MAC_BYTES:]
+    if body[0] != VERSION or not hmac.compare_digest(_mac(body), mac):
+        return None
+
+    try:
+        compact = json.loads(zlib.decompress(body[1:]))
+    except (zlib.error, ValueError):
+        return None
+
+    return {
+        "order_number": compact["o"],
+        "total_amount": compact["t"],
+        "items_count": compact["c"],
+        "user_name": compact["u"],
+        "items": [
+            {"product_name": name, "quantity": quantity, "price": price}
+            for name, quantity, price in compact["i"]
+        ]
+    }
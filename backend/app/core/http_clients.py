@@ -0,0 +1,136 @@
+"""
+Shared HTTP clients
+One keep-alive AsyncClient per upstream (n8n, AI service, payment gateway)
+so outbound calls reuse pooled connections instead of paying TCP/TLS
+setup on every request
+"""
+
+import time
+from typing import Callable, Dict
+import httpx
+
+from app.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Transport that counts requests, in-flight calls and latency"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_seconds = 0.0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        # httpcore does not expose pool size publicly; best effort
+        pool = getattr(self, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "open_connections": len(connections) if connections is not None else None,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 2) if self.requests else 0.0
+        }
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _client(
+    transport: InstrumentedTransport,
+    timeout: float,
+    base_url: str = "",
+    **kwargs
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=3.0),
+        transport=transport,
+        **kwargs
+    )
+
+
+# Upstream name -> client factory
+UPSTREAMS: Dict[str, Callable[[InstrumentedTransport], httpx.AsyncClient]] = {
+    "n8n": lambda transport: _client(transport, settings.OUTBOX_DELIVERY_TIMEOUT_SECONDS),
+    "ai": lambda transport: _client(
+        transport,
+        settings.AI_SERVICE_TIMEOUT_SECONDS,
+        base_url=settings.AI_SERVICE_URL
+    ),
+    "gateway": lambda transport: _client(
+        transport,
+        settings.RAZORPAY_TIMEOUT_SECONDS,
+        base_url=settings.RAZORPAY_API_BASE_URL.rstrip("/"),
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+    ),
+}
+
+
+class HTTPClientRegistry:
+    """
+    Lazily creates one shared client per upstream
+    Closed from the application shutdown hook
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedTransport] = {}
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            transport = InstrumentedTransport(
+                limits=_limits(),
+                http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+            )
+            client = UPSTREAMS[name](transport)
+            self._clients[name] = client
+            self._transports[name] = transport
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        return {
+            "http2": settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+            "upstreams": {
+                name: transport.stats()
+                for name, transport in self._transports.items()
+            }
+        }
+
+
+http_clients = HTTPClientRegistry()
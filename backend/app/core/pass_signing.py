@@ -0,0 +1,119 @@
+"""
+Exit Pass Signing
+Exit passes can be signed with Ed25519 so gate scanners holding only the
+public key verify them locally, without a server round trip.
+Tokens are standard compact JWS (alg "EdDSA"), so any JOSE library that
+supports Ed25519 can check them.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey
+)
+
+from app.config import settings
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def load_private_key(value: str) -> Ed25519PrivateKey:
+    """Accept a PEM private key or a base64url 32-byte seed"""
+    value = value.strip()
+    if value.startswith("-----BEGIN"):
+        key = serialization.load_pem_private_key(value.encode("utf-8"), password=None)
+        if not isinstance(key, Ed25519PrivateKey):
+            raise ValueError("QR_SIGNING_PRIVATE_KEY is not an Ed25519 key")
+        return key
+    return Ed25519PrivateKey.from_private_bytes(b64url_decode(value))
+
+
+class ExitPassSigner:
+    """
+    Signs and verifies EdDSA exit pass tokens
+    """
+
+    def __init__(self, private_key: Ed25519PrivateKey, key_id: str):
+        self.private_key = private_key
+        self.public_key: Ed25519PublicKey = private_key.public_key()
+        self.key_id = key_id
+        self._header = b64url_encode(json.dumps(
+            {"alg": "EdDSA", "typ": "JWT", "kid": key_id},
+            separators=(",", ":")
+        ).encode("utf-8"))
+
+    def sign(self, payload: dict) -> str:
+        claims = dict(payload)
+        if isinstance(claims.get("exp"), datetime):
+            claims["exp"] = int((claims["exp"] - datetime(1970, 1, 1)).total_seconds())
+
+        body = b64url_encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        signing_input = f"{self._header}.{body}"
+        signature = self.private_key.sign(signing_input.encode("ascii"))
+        return f"{signing_input}.{b64url_encode(signature)}"
+
+    def verify(self, token: str, verify_exp: bool = True) -> Optional[dict]:
+        """Claims of a valid (and, with verify_exp, unexpired) token, else None"""
+        try:
+            header, body, signature = token.split(".")
+            if json.loads(b64url_decode(header)).get("alg") != "EdDSA":
+                return None
+            self.public_key.verify(
+                b64url_decode(signature), f"{header}.{body}".encode("ascii")
+            )
+            claims = json.loads(b64url_decode(body))
+        except (ValueError, AttributeError, InvalidSignature):
+            return None
+
+        exp = claims.get("exp")
+        if verify_exp and exp is not None and exp < (datetime.utcnow() - datetime(1970, 1, 1)).total_seconds():
+            return None
+        return claims
+
+    def public_jwk(self) -> dict:
+        """Public key in JWK form for gate scanners"""
+        raw = self.public_key.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+        return {
+            "kty": "OKP",
+            "crv": "Ed25519",
+            "x": b64url_encode(raw),
+            "kid": self.key_id,
+            "alg": "EdDSA",
+            "use": "sig"
+        }
+
+
+def _build_signer() -> Optional[ExitPassSigner]:
+    if settings.QR_SIGNING_ALGORITHM != "EdDSA":
+        return None
+
+    if settings.QR_SIGNING_PRIVATE_KEY:
+        private_key = load_private_key(settings.QR_SIGNING_PRIVATE_KEY)
+    elif settings.DEBUG:
+        # Fine for a single dev process; every worker would get a different key
+        print("⚠️  QR_SIGNING_PRIVATE_KEY not set, using a temporary exit pass key")
+        private_key = Ed25519PrivateKey.generate()
+    else:
+        # Per-worker keys would reject each other's passes, and every pass on restart
+        raise RuntimeError(
+            "QR_SIGNING_ALGORITHM=EdDSA requires QR_SIGNING_PRIVATE_KEY unless DEBUG is on"
+        )
+    return ExitPassSigner(private_key, settings.QR_SIGNING_KEY_ID)
+
+
+exit_pass_signer = _build_signer()
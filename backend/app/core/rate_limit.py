@@ -0,0 +1,217 @@
+"""
+Token-bucket rate limiting
+Runs as ASGI middleware so abusive scanners are rejected with 429 before
+any dependency opens a database session
+"""
+
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.core.security import verify_token
+
+
+@dataclass
+class RateLimitRule:
+    """Limit for one route: `capacity` requests refilled over `period` seconds"""
+    name: str
+    method: str
+    path_pattern: str
+    capacity: int
+    period: float
+    key_by: Tuple[str, ...] = ("user", "device", "ip")
+
+    def __post_init__(self):
+        self._regex = re.compile(self.path_pattern)
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and self._regex.fullmatch(path) is not None
+
+
+def parse_limit(value: str) -> Tuple[int, float]:
+    """Parse a "<requests>/<seconds>" setting, e.g. "10/60" """
+    requests, seconds = value.split("/", 1)
+    return int(requests), float(seconds)
+
+
+class RateLimitStore(ABC):
+    """
+    Bucket storage interface
+    The in-process store is per worker; a shared backend (e.g. Redis)
+    can implement `take` to enforce limits across workers
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, retry_after_seconds)"""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process token buckets, evicting the least recently used key when full"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def take(self, key: str, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated_at) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                self.allowed += 1
+                allowed, retry_after = True, 0.0
+            else:
+                self.rejected += 1
+                allowed, retry_after = False, (1 - tokens) / refill_rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected
+        }
+
+
+def default_rules() -> List[RateLimitRule]:
+    """Rules for the login, product scan and exit gate endpoints"""
+    rules = []
+    for name, method, pattern, limit, key_by in (
+        ("guest_login", "POST", r"/api/v1/auth/guest-login",
+         settings.RATE_LIMIT_GUEST_LOGIN, ("device", "ip")),
+        ("product_scan", "GET", r"/api/v1/products/qr/[^/]+",
+         settings.RATE_LIMIT_PRODUCT_SCAN, ("user", "device", "ip")),
+        ("exit_verify", "POST", r"/api/v1/exit-qr/verify",
+         settings.RATE_LIMIT_EXIT_VERIFY, ("device", "user", "ip")),
+        ("exit_verify_batch", "POST", r"/api/v1/exit-qr/verify-batch",
+         settings.RATE_LIMIT_EXIT_VERIFY_BATCH, ("device", "user", "ip")),
+    ):
+        capacity, period = parse_limit(limit)
+        rules.append(RateLimitRule(name, method, pattern, capacity, period, key_by))
+    return rules
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying the first matching rule to each request
+    """
+
+    def __init__(
+        self,
+        app,
+        rules: Optional[List[RateLimitRule]] = None,
+        store: Optional[RateLimitStore] = None
+    ):
+        self.app = app
+        self.rules = rules if rules is not None else default_rules()
+        self.store = store or rate_limit_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = True, 0.0
+        for identity in self._identities(scope, rule.key_by):
+            ok, wait = self.store.take(
+                f"{rule.name}:{identity}", rule.capacity, rule.refill_rate
+            )
+            if not ok:
+                allowed, retry_after = False, max(retry_after, wait)
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        await self._reject(send, retry_after)
+
+    def _match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    @staticmethod
+    def _identities(scope, key_by: Tuple[str, ...]) -> List[str]:
+        """
+        Every bucket the request is charged to
+        X-Device-ID is client-chosen, so it never replaces the IP bucket on
+        its own; the IP is only skipped once a verified token identifies
+        the caller
+        """
+        headers = dict(scope.get("headers") or [])
+        identities = []
+        verified = False
+
+        if "user" in key_by:
+            auth = headers.get(b"authorization", b"").decode("latin-1")
+            if auth.lower().startswith("bearer "):
+                # Served from the verified token cache on repeat requests
+                payload = verify_token(auth[7:])
+                if payload and payload.get("sub"):
+                    identities.append(f"user:{payload['sub']}")
+                    verified = True
+
+        if "device" in key_by:
+            device_id = headers.get(b"x-device-id")
+            if device_id:
+                identities.append(f"device:{device_id.decode('latin-1')}")
+
+        if "ip" in key_by and not verified:
+            client = scope.get("client")
+            identities.append(f"ip:{client[0] if client else 'unknown'}")
+
+        return identities or ["anonymous"]
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = json.dumps({
+            "success": False,
+            "message": "Too many requests",
+            "error": "Rate limit exceeded"
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+rate_limit_store = InMemoryRateLimitStore()
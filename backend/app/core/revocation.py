@@ -0,0 +1,180 @@
+"""
+Access token revocation
+Logged-out token ids (`jti`) are held in memory behind a bloom filter so
+the per-request check never touches the database. The revoked_tokens
+table is the shared source of truth; each worker pulls new rows on a
+timer and prunes entries once the token would have expired anyway.
+"""
+
+import asyncio
+import calendar
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.revoked_token import RevokedToken
+
+# Re-read a little history on each sync so rows committed mid-sync aren't missed
+_SYNC_OVERLAP = timedelta(seconds=2)
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter using double hashing over one SHA-256 digest
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+
+class RevocationList:
+    """
+    In-memory revoked jti set with a bloom filter front
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self.capacity = capacity
+        self._bloom = BloomFilter(capacity)
+        self._revoked: Dict[str, float] = {}  # jti -> exp (epoch seconds)
+        self._lock = threading.Lock()
+        self._last_sync: Optional[datetime] = None
+        self.bloom_negatives = 0
+        self.exact_checks = 0
+
+    def add(self, jti: str, exp: float) -> None:
+        """Record a revoked jti locally"""
+        with self._lock:
+            if jti not in self._revoked:
+                self._revoked[jti] = exp
+                self._bloom.add(jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """O(1) check; the bloom filter answers most lookups on its own"""
+        if not jti:
+            return False
+        if jti not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+        self.exact_checks += 1
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def prune(self) -> int:
+        """Drop expired entries and rebuild the bloom filter"""
+        now = time.time()
+        with self._lock:
+            live = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            removed = len(self._revoked) - len(live)
+            if removed:
+                bloom = BloomFilter(max(self.capacity, len(live) * 2))
+                for jti in live:
+                    bloom.add(jti)
+                self._revoked = live
+                self._bloom = bloom
+        return removed
+
+    def sync_from_db(self) -> int:
+        """Pull revocations written by other workers; runs off the event loop"""
+        db = SessionLocal()
+        try:
+            # The cursor uses the database clock, same as created_at, so
+            # skew between worker clocks can't hide revocations
+            sync_started = db.execute(
+                select(func.timezone("UTC", func.now()))
+            ).scalar()
+            query = db.query(RevokedToken).filter(
+                RevokedToken.expires_at > sync_started
+            )
+            if self._last_sync is not None:
+                query = query.filter(
+                    RevokedToken.created_at >= self._last_sync
+                )
+            rows = query.all()
+
+            for row in rows:
+                self.add(row.jti, calendar.timegm(row.expires_at.utctimetuple()))
+
+            # Expired revocations are useless once the token itself has expired
+            db.query(RevokedToken).filter(
+                RevokedToken.expires_at <= sync_started
+            ).delete(synchronize_session=False)
+            db.commit()
+
+            self._last_sync = sync_started - _SYNC_OVERLAP
+            return len(rows)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._revoked),
+            "bloom_bits": self._bloom.num_bits,
+            "bloom_hashes": self._bloom.num_hashes,
+            "bloom_negatives": self.bloom_negatives,
+            "exact_checks": self.exact_checks,
+            "last_sync": self._last_sync.isoformat() if self._last_sync else None
+        }
+
+
+revocation_list = RevocationList(capacity=settings.REVOCATION_BLOOM_CAPACITY)
+
+
+def revoke_token(db, payload: dict) -> bool:
+    """
+    Revoke a verified access token payload
+    Persists the jti for other workers and records it locally
+    """
+    jti = payload.get("jti")
+    exp = payload.get("exp")
+    if not jti or exp is None:
+        # Legacy tokens without a jti cannot be revoked
+        return False
+
+    db.merge(RevokedToken(
+        jti=jti,
+        expires_at=datetime.utcfromtimestamp(exp)
+    ))
+    db.commit()
+
+    revocation_list.add(jti, float(exp))
+    return True
+
+
+async def revocation_sync_loop():
+    """Background task keeping this worker's revocation list current"""
+    while True:
+        try:
+            await asyncio.to_thread(revocation_list.sync_from_db)
+            revocation_list.prune()
+        except Exception as e:
+            print(f"⚠️  Revocation sync failed: {e}")
+        await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
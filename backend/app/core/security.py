@@ -1,10 +1,37 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+import asyncio
+import hashlib
+import uuid
 from app.config import settings
+from app.core.token_cache import TokenCache
+from app.core.pass_signing import exit_pass_signer
+from app.core.compact_token import decode_compact_token, encode_compact_token, is_compact_token
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes passlib flag hashes
+# with any other cost for rehash on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# Dedicated pool so bcrypt never runs on the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+_password_jobs_in_flight = 0
+
+# Verified token caches (separate secrets, so separate caches)
+access_token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
+qr_token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
 
 def hash_password(password: str) -> str:
     """Hash a password"""
@@ -14,6 +41,54 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_password_job(func, *args):
+    """Run a bcrypt call on the password pool, shedding load past the cap"""
+    global _password_jobs_in_flight
+    
+    if _password_jobs_in_flight >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"}
+        )
+    
+    _password_jobs_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        _password_jobs_in_flight -= 1
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_and_update_password(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop
+    Returns (valid, new_hash) where new_hash is set when the stored hash
+    uses a different bcrypt cost and should be replaced
+    """
+    return await _run_password_job(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+def password_pool_stats() -> dict:
+    """Password pool metrics"""
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "in_flight": _password_jobs_in_flight,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS
+    }
+
+def shutdown_password_executor():
+    """Stop the password pool on application shutdown"""
+    password_executor.shutdown(wait=False)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -22,14 +97,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.JWT_EXPIRY_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti lets a single token be revoked on logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
     """Verify JWT token and return payload"""
+    cached = access_token_cache.get(token)
+    if cached is not None:
+        return cached
+    
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        access_token_cache.set(token, payload)
         return payload
     except JWTError:
         return None
@@ -40,13 +121,60 @@ def create_qr_token(data: dict) -> str:
     expire = datetime.utcnow() + timedelta(minutes=settings.QR_EXPIRY_MINUTES)
     to_encode.update({"exp": expire})
     
+    # Short alphanumeric token; the pass id is all the server needs
+    if settings.QR_TOKEN_FORMAT == "compact":
+        expires_at = int((expire - datetime(1970, 1, 1)).total_seconds())
+        return encode_compact_token(uuid.UUID(to_encode["jti"]), expires_at)
+    
+    # Asymmetric signature when gates verify passes offline
+    if exit_pass_signer is not None:
+        return exit_pass_signer.sign(to_encode)
+    
     encoded_jwt = jwt.encode(to_encode, settings.QR_SECRET, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_qr_token(token: str) -> Optional[dict]:
-    """Verify QR code token"""
+def qr_token_digest(token: str) -> bytes:
+    """Fixed-width lookup key for an exit pass token"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+def verify_qr_token(token: str, verify_exp: bool = True) -> Optional[dict]:
+    """
+    Verify QR code token
+    verify_exp=False checks only the signature, for callers that judge
+    expiry from the pass row and need to tell expired apart from forged
+    """
+    cached = qr_token_cache.get(token)
+    if cached is not None:
+        return cached
+    
+    if is_compact_token(token):
+        payload = decode_compact_token(token, verify_exp)
+        if payload is not None:
+            qr_token_cache.set(token, payload)
+        return payload
+    
+    if exit_pass_signer is not None:
+        payload = exit_pass_signer.verify(token, verify_exp)
+        if payload is not None:
+            qr_token_cache.set(token, payload)
+            return payload
+    
+    # HS256 passes issued before switching to EdDSA stay valid until they expire
     try:
-        payload = jwt.decode(token, settings.QR_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        payload = jwt.decode(
+            token,
+            settings.QR_SECRET,
+            algorithms=[settings.JWT_ALGORITHM],
+            options={"verify_exp": verify_exp}
+        )
+        qr_token_cache.set(token, payload)
         return payload
     except JWTError:
         return None
+
+def token_cache_stats() -> dict:
+    """Hit/miss metrics for the verified token caches"""
+    return {
+        "access_tokens": access_token_cache.stats(),
+        "qr_tokens": qr_token_cache.stats()
+    }
@@ -0,0 +1,92 @@
+"""
+Verified token cache
+Keeps recently verified JWT payloads in memory so repeat requests with
+the same bearer token skip signature checking and JSON parsing
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified token payloads keyed by token digest
+    Entries are dropped once the token's `exp` claim has passed
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """Fixed-size key so the cache never holds raw tokens"""
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return a copy of the cached payload, or None on miss/expiry"""
+        if self.max_size <= 0:
+            return None
+
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def set(self, token: str, payload: dict) -> None:
+        """Cache a verified payload until its `exp` claim"""
+        if self.max_size <= 0:
+            return
+
+        exp = payload.get("exp")
+        if exp is None or float(exp) <= time.time():
+            # Tokens without expiry, or already expired, are not cached
+            return
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (float(exp), dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, token: str) -> None:
+        """Remove a token from the cache"""
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Cache metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -1,8 +1,29 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.config import settings
 from app.database import init_db
+from app.core.security import (
+    token_cache_stats,
+    password_pool_stats,
+    shutdown_password_executor
+)
+from app.core.revocation import revocation_list, revocation_sync_loop
+from app.core.rate_limit import RateLimitMiddleware, rate_limit_store
+from app.core.dependencies import require_metrics_access
+from app.services.demo_payment import demo_payment_service
+from app.services.razorpay_service import razorpay_service
+from app.services.outbox import outbox_dispatcher
+from app.core.http_clients import http_clients
+from app.services.webhook_dedupe import webhook_deduplicator
+from app.services.webhook_queue import webhook_queue
+from app.services.payment_events import payment_event_broker
+from app.services.reconciliation import payment_reconciler
+from app.services.gateway_orders import gateway_order_preparer
+from app.services.qr_cache import qr_image_cache
+from app.services.sweeper import expiry_sweeper
+from app.services.gate_feed import gate_feed
 
 # Import all routers
 from app.api.auth.routes import router as auth_router
@@ -23,6 +44,9 @@ app = FastAPI(
     redoc_url="/api/redoc"
 )
 
+# Rate limiting (added first so CORS headers wrap 429 responses)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,9 +82,29 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    payment_event_broker.start()
+    app.state.background_tasks = [
+        asyncio.create_task(revocation_sync_loop()),
+        asyncio.create_task(outbox_dispatcher.run()),
+        asyncio.create_task(webhook_queue.run()),
+        asyncio.create_task(qr_image_cache.run())
+    ]
+    if settings.SWEEPER_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(expiry_sweeper.run()))
+    if settings.RECONCILIATION_ENABLED and settings.PAYMENT_MODE == "razorpay":
+        app.state.background_tasks.append(asyncio.create_task(payment_reconciler.run()))
     print(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} started!")
     print(f"📚 API Docs: http://localhost:8000/api/docs")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background resources on shutdown"""
+    for task in app.state.background_tasks:
+        task.cancel()
+    payment_event_broker.stop()
+    shutdown_password_executor()
+    await http_clients.aclose()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -78,6 +122,28 @@ async def health_check():
         "version": settings.APP_VERSION
     }
 
+@app.get("/api/v1/metrics", dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """In-process performance metrics (staff or METRICS_TOKEN only)"""
+    return {
+        "token_cache": token_cache_stats(),
+        "password_pool": password_pool_stats(),
+        "token_revocation": revocation_list.stats(),
+        "rate_limit": rate_limit_store.stats(),
+        "razorpay": razorpay_service.stats(),
+        "outbox": outbox_dispatcher.stats(),
+        "webhook_dedupe": webhook_deduplicator.stats(),
+        "webhook_queue": webhook_queue.stats(),
+        "payment_events": payment_event_broker.stats(),
+        "gate_feed": gate_feed.stats(),
+        "reconciliation": payment_reconciler.stats(),
+        "gateway_orders": gateway_order_preparer.stats(),
+        "qr_image_cache": qr_image_cache.stats(),
+        "sweeper": expiry_sweeper.stats(),
+        "http_clients": http_clients.stats(),
+        "demo_payments": demo_payment_service.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -13,7 +13,7 @@ class Cart(Base):
     product_uuid = Column(UUID(as_uuid=True), ForeignKey("products.product_uuid"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Stale cart sweep
     
     # Relationships
     user = relationship("User", back_populates="carts")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -10,11 +10,13 @@ class ExitQR(Base):
     
     exit_qr_uuid = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     order_uuid = Column(UUID(as_uuid=True), ForeignKey("orders.order_uuid"), nullable=False, unique=True, index=True)
-    token = Column(Text, nullable=False, unique=True, index=True)
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True, index=True)  # sha256 of token, the lookup key
+    token = Column(Text, nullable=True)  # Raw token, only needed to re-render the pass
     qr_image_path = Column(String(500), nullable=True)
+    display_data = Column(LargeBinary, nullable=True)  # Signed gate display snapshot
     used = Column(Boolean, default=False, index=True)
     expires_at = Column(DateTime, nullable=False, index=True)
-    used_at = Column(DateTime, nullable=True)
+    used_at = Column(DateTime, nullable=True, index=True)  # Gate sync cursor
     verified_by = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
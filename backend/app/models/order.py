@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -20,8 +20,21 @@ class Order(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = Column(DateTime, nullable=True)
     
+    # Gateway order created ahead of checkout, and the amount it was created for
+    gateway_order_id = Column(String(255), nullable=True)
+    gateway_order_amount = Column(Float, nullable=True)
+    
     # Relationships
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     payment = relationship("Payment", back_populates="order", uselist=False, cascade="all, delete-orphan")
     exit_qr = relationship("ExitQR", back_populates="order", uselist=False, cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Only pending orders are ever checked for expiry
+        Index(
+            "ix_orders_pending_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+    )
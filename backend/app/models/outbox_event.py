@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    event_uuid = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_type = Column(String(100), nullable=False)  # payment_success
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, delivered, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+class ProcessedWebhookEvent(Base):
+    __tablename__ = "processed_webhook_events"
+    
+    event_id = Column(String(255), primary_key=True)  # Gateway event id
+    provider = Column(String(50), nullable=False)  # razorpay, demo
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, text
+from app.database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # Database clock, so the sync cursor never depends on worker clocks agreeing
+    created_at = Column(
+        DateTime,
+        server_default=text("timezone('utc', now())"),
+        nullable=False,
+        index=True
+    )
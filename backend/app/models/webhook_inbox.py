@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Text
+from datetime import datetime
+from app.database import Base
+
+class WebhookInbox(Base):
+    __tablename__ = "webhook_inbox"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)  # Arrival order
+    provider = Column(String(50), nullable=False)  # razorpay, demo
+    event_id = Column(String(255), nullable=True)
+    order_uuid = Column(String(64), nullable=True, index=True)  # Ordering key
+    body = Column(Text, nullable=False)  # Raw JSON as received
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, processed, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
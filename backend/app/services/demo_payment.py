@@ -3,13 +3,17 @@ Demo Payment Service - For Testing/Showcase
 Simulates payment without real gateway
 """
 
+import math
 import uuid
 import random
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional
+from typing import Awaitable, Callable, Optional, Set
 from pydantic import BaseModel
 
+from app.config import settings
+
 
 class DemoPaymentRequest(BaseModel):
     order_uuid: str
@@ -33,11 +37,50 @@ class DemoPaymentResponse(BaseModel):
 class DemoPaymentService:
     """
     Simulates payment gateway behavior for testing
+    Payments are created pending and completed later by a background task
+    that delivers a webhook, like a real gateway would
+
+    For load tests it can also reproduce gateway incidents: a lognormal
+    latency tail, webhooks that never arrive, duplicate deliveries, stale
+    events arriving after the final one, and a cap on webhook throughput
     """
     
-    def __init__(self, delay_seconds: int = 3, failure_rate: int = 0):
+    # z-score of the 99th percentile of a standard normal distribution
+    P99_Z = 2.326
+    
+    # Outcomes of payments created but not yet scheduled for completion
+    MAX_PENDING_OUTCOMES = 10000
+    
+    def __init__(
+        self,
+        delay_seconds: float = 3,
+        failure_rate: int = 0,
+        delay_p99_seconds: float = 0,
+        timeout_rate: int = 0,
+        duplicate_rate: int = 0,
+        out_of_order_rate: int = 0,
+        max_webhooks_per_second: float = 0
+    ):
         self.delay_seconds = delay_seconds
         self.failure_rate = failure_rate  # 0-100
+        self.delay_p99_seconds = delay_p99_seconds
+        self.timeout_rate = timeout_rate  # 0-100
+        self.duplicate_rate = duplicate_rate  # 0-100
+        self.out_of_order_rate = out_of_order_rate  # 0-100
+        self.max_webhooks_per_second = max_webhooks_per_second
+        # transaction_id -> should_fail, oldest first
+        self._outcomes: "OrderedDict[str, bool]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._webhook_handler: Optional[Callable[[dict], Awaitable]] = None
+        self._next_slot = 0.0
+        self.delivered = 0
+        self.timed_out = 0
+        self.duplicated = 0
+        self.reordered = 0
+    
+    def set_webhook_handler(self, handler: Callable[[dict], Awaitable]):
+        """Register the coroutine that delivers simulated webhooks to the app"""
+        self._webhook_handler = handler
     
     async def create_payment(
         self, 
@@ -47,7 +90,7 @@ class DemoPaymentService:
         simulate_failure: bool = False
     ) -> DemoPaymentResponse:
         """
-        Create a demo payment
+        Create a demo payment (returns immediately with a pending status)
         
         Args:
             order_uuid: Order UUID
@@ -62,24 +105,12 @@ class DemoPaymentService:
         payment_uuid = str(uuid.uuid4())
         transaction_id = f"DEMO_TXN_{random.randint(1000000000, 9999999999)}"
         
-        # Simulate payment processing delay
-        await asyncio.sleep(self.delay_seconds)
-        
-        # Determine if payment should fail
-        should_fail = simulate_failure or (random.randint(1, 100) <= self.failure_rate)
-        
-        if should_fail:
-            return DemoPaymentResponse(
-                payment_uuid=payment_uuid,
-                transaction_id=transaction_id,
-                order_uuid=order_uuid,
-                amount=amount,
-                status="failed",
-                payment_method=payment_method,
-                payment_url=None,
-                qr_code=None,
-                timestamp=datetime.utcnow()
-            )
+        # Decide the outcome now; it is delivered later via webhook
+        should_fail = simulate_failure or self._roll(self.failure_rate)
+        self._outcomes[transaction_id] = should_fail
+        while len(self._outcomes) > self.MAX_PENDING_OUTCOMES:
+            # Never scheduled, e.g. initiate failed after creating it
+            self._outcomes.popitem(last=False)
         
         # Generate demo UPI QR code data
         upi_qr = self._generate_upi_qr(amount, transaction_id)
@@ -90,13 +121,122 @@ class DemoPaymentService:
             transaction_id=transaction_id,
             order_uuid=order_uuid,
             amount=amount,
-            status="success",
+            status="pending",
             payment_method=payment_method,
             payment_url=payment_url,
             qr_code=upi_qr,
             timestamp=datetime.utcnow()
         )
     
+    def discard_payment(self, transaction_id: str):
+        """Forget a created payment that will never be scheduled"""
+        self._outcomes.pop(transaction_id, None)
+    
+    def schedule_completion(
+        self,
+        transaction_id: str,
+        order_uuid: str,
+        payment_uuid: str,
+        amount: float,
+        payment_method: str = "upi"
+    ):
+        """
+        Complete a pending demo payment in the background
+        Call after the payment record is committed so the webhook can find it
+        """
+        should_fail = self._outcomes.pop(transaction_id, False)
+        webhook_data = {
+            "event_id": str(uuid.uuid4()),
+            "order_uuid": order_uuid,
+            "payment_uuid": payment_uuid,
+            "status": "failed" if should_fail else "success",
+            "provider_reference": transaction_id,
+            "transaction_id": transaction_id,
+            "amount": amount,
+            "payment_method": payment_method,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        
+        task = asyncio.create_task(self._complete_later(webhook_data))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    @staticmethod
+    def _roll(rate: int) -> bool:
+        return rate > 0 and random.randint(1, 100) <= rate
+    
+    def _sample_delay(self) -> float:
+        """Webhook latency: fixed, or lognormal with the configured p50/p99"""
+        median = self.delay_seconds
+        if median <= 0 or self.delay_p99_seconds <= median:
+            return max(0.0, median)
+        sigma = math.log(self.delay_p99_seconds / median) / self.P99_Z
+        return random.lognormvariate(math.log(median), sigma)
+    
+    async def _throttle(self):
+        """Space deliveries out to at most max_webhooks_per_second"""
+        if self.max_webhooks_per_second <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1.0 / self.max_webhooks_per_second
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _deliver(self, webhook_data: dict):
+        await self._throttle()
+        try:
+            await self._webhook_handler(webhook_data)
+            self.delivered += 1
+        except Exception as e:
+            print(f"⚠️  Demo webhook delivery failed: {e}")
+    
+    async def _complete_later(self, webhook_data: dict):
+        """Wait out the simulated gateway delay, then deliver the webhook(s)"""
+        await asyncio.sleep(self._sample_delay())
+        
+        if self._webhook_handler is None:
+            print("⚠️  Demo payment completed but no webhook handler is registered")
+            return
+        
+        if self._roll(self.timeout_rate):
+            # The gateway never calls back; the payment stays pending
+            self.timed_out += 1
+            return
+        
+        await self._deliver(webhook_data)
+        
+        if self._roll(self.out_of_order_rate):
+            # An earlier failed attempt whose event shows up after the outcome
+            self.reordered += 1
+            await self._deliver({
+                **webhook_data,
+                "event_id": str(uuid.uuid4()),
+                "status": "failed",
+                "provider_reference": f"{webhook_data['transaction_id']}_ATTEMPT_1"
+            })
+        
+        if self._roll(self.duplicate_rate):
+            # Same event id again, as gateways do when an ack is slow or lost
+            self.duplicated += 1
+            await asyncio.sleep(self._sample_delay())
+            await self._deliver(webhook_data)
+    
+    @property
+    def pending_completions(self) -> int:
+        return len(self._tasks)
+    
+    def stats(self) -> dict:
+        return {
+            "pending_completions": self.pending_completions,
+            "delivered": self.delivered,
+            "timed_out": self.timed_out,
+            "duplicated": self.duplicated,
+            "reordered": self.reordered
+        }
+    
     def _generate_upi_qr(self, amount: float, transaction_id: str) -> str:
         """Generate demo UPI QR code string"""
         return f"upi://pay?pa=merchant@upi&pn=SmartCheckout&am={amount}&cu=INR&tn={transaction_id}"
@@ -134,6 +274,11 @@ class DemoPaymentService:
 
 # Singleton instance
 demo_payment_service = DemoPaymentService(
-    delay_seconds=3,  # Configurable via ENV
-    failure_rate=0     # 0% failure rate by default
+    delay_seconds=settings.DEMO_PAYMENT_DELAY_SECONDS,
+    failure_rate=settings.DEMO_FAILURE_RATE,
+    delay_p99_seconds=settings.DEMO_PAYMENT_DELAY_P99_SECONDS,
+    timeout_rate=settings.DEMO_TIMEOUT_RATE,
+    duplicate_rate=settings.DEMO_DUPLICATE_RATE,
+    out_of_order_rate=settings.DEMO_OUT_OF_ORDER_RATE,
+    max_webhooks_per_second=settings.DEMO_MAX_WEBHOOKS_PER_SECOND
 )
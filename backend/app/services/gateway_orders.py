@@ -0,0 +1,140 @@
+"""
+Gateway Order Preparation
+The Razorpay order is created in the background as soon as our order is
+placed, so tapping Pay usually only has to hand out the prepared id
+instead of waiting on a gateway round trip
+"""
+
+import asyncio
+from typing import Dict, Optional, Tuple
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.order import Order
+from app.services.razorpay_service import razorpay_service
+
+
+class GatewayOrderPreparer:
+    """
+    Creates gateway orders ahead of checkout and hands them to initiate
+    A prepared order is only used while its amount still matches the order
+    """
+
+    def __init__(self, wait_seconds: float = 2.0):
+        self.wait_seconds = wait_seconds
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.prepared = 0
+        self.reused = 0
+        self.created_inline = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            settings.GATEWAY_ORDER_PREPARE_ENABLED
+            and settings.PAYMENT_MODE == "razorpay"
+            and razorpay_service.configured
+        )
+
+    def schedule(self, order_uuid, amount: float, user_uuid):
+        """
+        Start creating the gateway order for a freshly placed order
+        Call again whenever the order amount changes; the newest amount wins
+        """
+        if not self.enabled:
+            return
+
+        key = str(order_uuid)
+        task = asyncio.create_task(self._prepare(key, float(amount), str(user_uuid)))
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task):
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+
+        task.add_done_callback(_done)
+
+    async def _prepare(self, order_uuid: str, amount: float, user_uuid: str) -> Optional[Tuple[str, float]]:
+        try:
+            razorpay_order = await razorpay_service.create_order(
+                order_uuid=order_uuid,
+                amount=amount,
+                notes={"order_uuid": order_uuid, "user_uuid": user_uuid}
+            )
+        except Exception as e:
+            # initiate falls back to creating the gateway order itself
+            self.failed += 1
+            print(f"⚠️  Gateway order preparation failed for {order_uuid}: {e}")
+            return None
+
+        await asyncio.to_thread(
+            self._store, order_uuid, razorpay_order.razorpay_order_id, amount
+        )
+        self.prepared += 1
+        return razorpay_order.razorpay_order_id, amount
+
+    def _store(self, order_uuid: str, gateway_order_id: str, amount: float):
+        """
+        Attach the gateway order, unless the order amount moved on meanwhile
+        or initiate already created one inline (that id is on the payment)
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Order).where(
+                    Order.order_uuid == order_uuid,
+                    Order.total_amount == amount,
+                    Order.status == "pending",
+                    Order.gateway_order_id.is_(None)
+                ).values(gateway_order_id=gateway_order_id, gateway_order_amount=amount)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def get_or_create(self, order: Order, user_uuid) -> str:
+        """
+        Gateway order id for initiate: the prepared one if it still matches,
+        the in-flight one if it lands within wait_seconds, else a new one
+        The caller commits the order, which records an inline creation
+        """
+        amount = float(order.total_amount)
+
+        if order.gateway_order_id and order.gateway_order_amount == amount:
+            self.reused += 1
+            return order.gateway_order_id
+
+        task = self._inflight.get(str(order.order_uuid))
+        if task is not None:
+            try:
+                # shield() so a slow preparation keeps going for the next attempt
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=self.wait_seconds)
+            except asyncio.TimeoutError:
+                result = None
+            if result is not None and result[1] == amount:
+                order.gateway_order_id, order.gateway_order_amount = result
+                self.reused += 1
+                return result[0]
+
+        razorpay_order = await razorpay_service.create_order(
+            order_uuid=str(order.order_uuid),
+            amount=amount,
+            notes={"order_uuid": str(order.order_uuid), "user_uuid": str(user_uuid)}
+        )
+        order.gateway_order_id = razorpay_order.razorpay_order_id
+        order.gateway_order_amount = amount
+        self.created_inline += 1
+        return razorpay_order.razorpay_order_id
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "prepared": self.prepared,
+            "reused": self.reused,
+            "created_inline": self.created_inline,
+            "failed": self.failed
+        }
+
+
+gateway_order_preparer = GatewayOrderPreparer(wait_seconds=settings.GATEWAY_ORDER_WAIT_SECONDS)
@@ -0,0 +1,188 @@
+"""
+Transactional Outbox for n8n
+Payment events are inserted in the same transaction as the order status
+change and delivered by a background dispatcher, so payment endpoints
+never wait on n8n
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+import httpx
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.core.http_clients import http_clients
+from app.models.outbox_event import OutboxEvent
+
+
+def enqueue_event(db: Session, event_type: str, payload: dict) -> Optional[OutboxEvent]:
+    """
+    Add an event to the outbox (caller commits)
+    Skipped when n8n is disabled so the table only holds deliverable events
+    """
+    if not (settings.N8N_ENABLED and settings.N8N_WEBHOOK_URL):
+        return None
+
+    event = OutboxEvent(
+        event_type=event_type,
+        payload=json.dumps(payload, default=str)
+    )
+    db.add(event)
+    # Wake the dispatcher once the row is visible, see _wake_after_commit
+    db.info["outbox_wake"] = True
+    return event
+
+
+@listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session):
+    if session.info.pop("outbox_wake", False):
+        outbox_dispatcher.wake()
+
+
+@listens_for(Session, "after_rollback")
+def _clear_wake_on_rollback(session: Session):
+    session.info.pop("outbox_wake", None)
+
+
+class OutboxDispatcher:
+    """
+    Drains pending outbox events in batches
+    Rows are leased with SELECT ... FOR UPDATE SKIP LOCKED so several
+    workers can dispatch concurrently without double delivery
+    """
+
+    def __init__(self):
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.poll_seconds = settings.OUTBOX_POLL_SECONDS
+        self.max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+        self.lease_seconds = 60
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.delivered = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    def wake(self):
+        """Start the next dispatch round immediately"""
+        if self._wake_event is not None:
+            # Safe from worker threads as well as the event loop
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    def _claim_batch(self) -> List[dict]:
+        """Lease due events; runs off the event loop"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            events = db.query(OutboxEvent).filter(
+                OutboxEvent.status == "pending",
+                OutboxEvent.next_attempt_at <= now
+            ).order_by(
+                OutboxEvent.next_attempt_at
+            ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            claimed = []
+            for event in events:
+                # Lease: hidden from other dispatchers until the lease expires
+                event.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+                event.attempts += 1
+                claimed.append({
+                    "event_uuid": event.event_uuid,
+                    "event_type": event.event_type,
+                    "payload": json.loads(event.payload),
+                    "attempts": event.attempts
+                })
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record_results(self, results: List[tuple]):
+        """Persist delivery outcomes for a batch"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            for event, error in results:
+                row = db.query(OutboxEvent).filter(
+                    OutboxEvent.event_uuid == event["event_uuid"]
+                ).first()
+                if row is None:
+                    continue
+
+                if error is None:
+                    row.status = "delivered"
+                    row.delivered_at = now
+                    row.last_error = None
+                elif event["attempts"] >= self.max_attempts:
+                    row.status = "dead"
+                    row.last_error = error
+                    self.dead_lettered += 1
+                    print(f"☠️  Outbox event {row.event_uuid} dead-lettered: {error}")
+                else:
+                    # Exponential backoff capped at 10 minutes
+                    backoff = min(600, 2 ** event["attempts"])
+                    row.next_attempt_at = now + timedelta(seconds=backoff)
+                    row.last_error = error
+            db.commit()
+        finally:
+            db.close()
+
+    async def _deliver(self, event: dict) -> Optional[str]:
+        """POST one event to n8n; returns an error string on failure"""
+        try:
+            response = await http_clients.get("n8n").post(
+                settings.N8N_WEBHOOK_URL,
+                json=event["payload"]
+            )
+            if response.status_code >= 300:
+                self.failed += 1
+                return f"n8n returned status {response.status_code}"
+            self.delivered += 1
+            return None
+        except httpx.HTTPError as e:
+            self.failed += 1
+            return f"{type(e).__name__}: {e}"
+
+    async def dispatch_once(self) -> int:
+        """Deliver one batch; returns the number of events attempted"""
+        events = await asyncio.to_thread(self._claim_batch)
+        if not events:
+            return 0
+
+        errors = await asyncio.gather(*(self._deliver(event) for event in events))
+        await asyncio.to_thread(self._record_results, list(zip(events, errors)))
+        return len(events)
+
+    async def run(self):
+        """Background loop started with the application"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        while True:
+            try:
+                attempted = await self.dispatch_once()
+            except Exception as e:
+                print(f"⚠️  Outbox dispatch failed: {e}")
+                attempted = 0
+
+            # A full batch means more are probably waiting
+            if attempted >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    def stats(self) -> dict:
+        return {
+            "delivered": self.delivered,
+            "failed_attempts": self.failed,
+            "dead_lettered": self.dead_lettered
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,143 @@
+"""
+Payment Status Events
+Status changes are published with Postgres NOTIFY inside the transaction
+that commits them, so every worker hears about them exactly when they
+become visible. Each worker keeps one LISTEN connection and fans events
+out to its local Server-Sent Events subscribers. Other features can
+listen on their own channels over the same connection.
+"""
+
+import asyncio
+import json
+import select
+import threading
+from typing import Callable, Dict, Optional, Set
+import psycopg2
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+
+CHANNEL = "payment_status"
+TERMINAL_STATUSES = {"success", "failed"}
+
+
+def publish_payment_status(
+    db: Session,
+    payment_uuid,
+    order_uuid,
+    status: str,
+    order_status: Optional[str] = None
+):
+    """
+    Queue a status notification in the caller's transaction
+    Postgres delivers it on commit and drops it on rollback
+    """
+    if payment_uuid is None:
+        return
+
+    payload = json.dumps({
+        "payment_uuid": str(payment_uuid),
+        "order_uuid": str(order_uuid),
+        "status": status,
+        "order_status": order_status
+    })
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {
+        "channel": CHANNEL,
+        "payload": payload
+    })
+
+
+class PaymentEventBroker:
+    """
+    Per-worker fan-out of payment status notifications
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._channels: Dict[str, Callable[[dict], None]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.delivered = 0
+
+    def subscribe(self, payment_uuid: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self._subscribers.setdefault(payment_uuid, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, payment_uuid: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(payment_uuid)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[payment_uuid]
+
+    def listen(self, channel: str, handler: Callable[[dict], None]):
+        """
+        Also LISTEN on another channel; handler runs on the event loop
+        Register before start()
+        """
+        self._channels[channel] = handler
+    
+    def _dispatch(self, event: dict):
+        """Runs on the event loop"""
+        for queue in list(self._subscribers.get(event["payment_uuid"], ())):
+            try:
+                queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                pass
+
+    def _listen(self):
+        """LISTEN loop on a dedicated connection, reconnecting on failure"""
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    for channel in (CHANNEL, *self._channels):
+                        cursor.execute(f"LISTEN {channel};")
+
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        event = json.loads(notify.payload)
+                        handler = self._channels.get(notify.channel)
+                        if handler is not None:
+                            self._loop.call_soon_threadsafe(handler, event)
+                        elif event.get("payment_uuid") in self._subscribers:
+                            self._loop.call_soon_threadsafe(self._dispatch, event)
+            except Exception as e:
+                print(f"⚠️  Payment event listener error: {e}")
+                self._stopped.wait(2.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def start(self):
+        """Start the listener thread (application startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._listen, name="payment-events", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> dict:
+        return {
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "payments_watched": len(self._subscribers),
+            "delivered": self.delivered
+        }
+
+
+payment_event_broker = PaymentEventBroker()
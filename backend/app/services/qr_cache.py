@@ -0,0 +1,181 @@
+"""
+Exit QR Image Cache
+Rendering a QR code (matrix build, PIL render, PNG encode) is far more
+expensive than serving stored bytes, and a pass page gets refreshed a lot.
+Rendered PNGs are kept in a memory LRU in front of an on-disk store, keyed
+by the token digest, and dropped once the pass is used or expires.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.core.security import qr_token_digest
+from app.utils.qr_generator import render_qr_png, render_qr_svg
+
+
+class QRImageCache:
+    """
+    Memory LRU of rendered exit QR images backed by PNG files in QR_CACHE_DIR
+    """
+
+    def __init__(self, max_size: int = 1000, directory: str = "storage/exit_qr"):
+        self.max_size = max_size
+        self.directory = directory
+        self._images: "OrderedDict[str, Tuple[bytes, datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return qr_token_digest(token).hex()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def get_png(
+        self,
+        token: str,
+        expires_at: datetime,
+        image_path: Optional[str] = None
+    ) -> Tuple[bytes, str]:
+        """
+        PNG bytes for a pass and the file they are stored in
+        Renders and stores the image on a miss
+        """
+        digest = self.digest(token)
+        path = image_path or self.path_for(digest)
+
+        with self._lock:
+            entry = self._images.get(digest)
+            if entry is not None:
+                self._images.move_to_end(digest)
+                self.memory_hits += 1
+                return entry[0], path
+
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            self.disk_hits += 1
+        except OSError:
+            png = render_qr_png(token)
+            self.renders += 1
+            path = self._write(digest, png)
+
+        self._remember(digest, png, expires_at)
+        return png, path
+
+    def get_image(
+        self,
+        token: str,
+        expires_at: datetime,
+        fmt: str = "png",
+        box_size: int = 10,
+        border: int = 4,
+        image_path: Optional[str] = None
+    ) -> bytes:
+        """
+        Image bytes in any format and size
+        Only the default PNG is stored on disk; other variants live in memory
+        """
+        if fmt == "png" and box_size == 10 and border == 4:
+            return self.get_png(token, expires_at, image_path)[0]
+
+        key = f"{self.digest(token)}:{fmt}:{box_size}:{border}"
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is not None:
+                self._images.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        render = render_qr_svg if fmt == "svg" else render_qr_png
+        image = render(token, box_size=box_size, border=border)
+        self.renders += 1
+        self._remember(key, image, expires_at)
+        return image
+
+    def _write(self, digest: str, png: bytes) -> str:
+        """Atomically store a rendered image so readers never see half a file"""
+        path = self.path_for(digest)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Memory copy still serves this worker
+            print(f"⚠️  Could not store QR image {path}: {e}")
+        return path
+
+    def _remember(self, key: str, image: bytes, expires_at: datetime):
+        with self._lock:
+            self._images[key] = (image, expires_at)
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_size:
+                self._images.popitem(last=False)
+
+    def evict(self, token_hash: bytes, image_path: Optional[str] = None):
+        """Drop a pass image once it has been used or has expired"""
+        digest = token_hash.hex()
+        with self._lock:
+            for key in [k for k in self._images if k.split(":", 1)[0] == digest]:
+                del self._images[key]
+        try:
+            os.remove(image_path or self.path_for(digest))
+        except OSError:
+            pass
+
+    def prune_expired(self) -> int:
+        """Drop expired images from memory and disk; returns files removed"""
+        now = datetime.utcnow()
+        with self._lock:
+            for key in [k for k, (_, exp) in self._images.items() if exp < now]:
+                del self._images[key]
+
+        # A file is written when its pass is issued, so its age bounds the pass lifetime
+        cutoff = time.time() - settings.QR_EXPIRY_MINUTES * 60
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    async def run(self):
+        """Periodic cleanup started with the application"""
+        while True:
+            await asyncio.sleep(settings.QR_CACHE_PRUNE_SECONDS)
+            try:
+                await asyncio.to_thread(self.prune_expired)
+            except Exception as e:
+                print(f"⚠️  QR image cache prune failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._images),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders
+        }
+
+
+qr_image_cache = QRImageCache(
+    max_size=settings.QR_CACHE_SIZE,
+    directory=settings.QR_CACHE_DIR
+)
@@ -1,16 +1,21 @@
 """
 Razorpay Payment Integration Service
 Production-ready payment processing
+Talks to the Razorpay REST API over a shared keep-alive connection pool
 """
 
-import razorpay
+import asyncio
 import hmac
 import hashlib
+import random
 from typing import Optional, Dict, Any
 from datetime import datetime
+import httpx
 from pydantic import BaseModel
 from fastapi import HTTPException
 from app.config import settings
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.http_clients import http_clients
 
 
 class RazorpayPaymentRequest(BaseModel):
@@ -35,24 +40,107 @@ class RazorpayService:
     """
     Handles all Razorpay payment operations
     """
-    
+
+    # Gateway responses worth retrying / counting against the circuit
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
     def __init__(self):
-        self.client = None
+        self.key_id = getattr(settings, 'RAZORPAY_KEY_ID', '')
+        self.key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', '')
         self.webhook_secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
-        self._init_client()
-    
-    def _init_client(self):
-        """Initialize Razorpay client if credentials are available"""
-        key_id = getattr(settings, 'RAZORPAY_KEY_ID', '')
-        key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', '')
-        
-        if key_id and key_secret:
+        self.max_retries = settings.RAZORPAY_MAX_RETRIES
+        self.breaker = CircuitBreaker(
+            "razorpay",
+            failure_threshold=settings.RAZORPAY_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.RAZORPAY_CIRCUIT_RESET_SECONDS
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.key_id and self.key_secret)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared keep-alive gateway client"""
+        return http_clients.get("gateway")
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        json: Optional[dict] = None,
+        idempotent: bool = False,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Call the gateway with circuit breaking and bounded retries
+        Non-idempotent calls are only retried when the connection
+        could not be established, i.e. the request never reached Razorpay
+        """
+
+        timeout = timeout or settings.RAZORPAY_TIMEOUT_SECONDS
+
+        if not self.configured:
+            raise HTTPException(
+                status_code=500,
+                detail="Razorpay is not configured. Please check your API keys."
+            )
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError as e:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Payment gateway temporarily unavailable",
+                    headers={"Retry-After": str(max(1, int(e.retry_after)))}
+                )
+
+            retryable = False
             try:
-                self.client = razorpay.Client(auth=(key_id, key_secret))
-            except Exception as e:
-                print(f"Warning: Could not initialize Razorpay client: {e}")
-    
-    def create_order(
+                response = await self.client.request(
+                    method, path, json=json, timeout=timeout
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self.breaker.record_failure()
+                retryable, error = True, e
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                retryable, error = idempotent, e
+            except asyncio.CancelledError:
+                # No outcome; don't leave a half-open trial marked in flight
+                self.breaker.release_trial()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code in self.RETRYABLE_STATUS:
+                    self.breaker.record_failure()
+                    retryable = idempotent
+                    error = Exception(f"HTTP {response.status_code}: {response.text}")
+                else:
+                    # 4xx means the gateway is healthy but rejected the request
+                    self.breaker.record_success()
+                    if response.status_code >= 400:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Razorpay request failed: {response.text}"
+                        )
+                    return response.json()
+
+            if not retryable or attempt >= self.max_retries:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Payment gateway error: {error}"
+                )
+
+            # Exponential backoff with full jitter
+            attempt += 1
+            await asyncio.sleep(random.uniform(0, 0.2 * (2 ** attempt)))
+
+    async def create_order(
         self,
         order_uuid: str,
         amount: float,
@@ -61,26 +149,20 @@ class RazorpayService:
     ) -> RazorpayPaymentResponse:
         """
         Create a Razorpay order
-        
+
         Args:
             order_uuid: Internal order UUID
             amount: Amount in rupees (will be converted to paise)
             currency: Currency code (default: INR)
             notes: Additional notes
-            
+
         Returns:
             Razorpay order details
         """
-        
-        if not self.client:
-            raise HTTPException(
-                status_code=500,
-                detail="Razorpay is not configured. Please check your API keys."
-            )
-        
+
         # Convert rupees to paise (Razorpay uses smallest currency unit)
-        amount_in_paise = int(amount * 100)
-        
+        amount_in_paise = int(round(amount * 100))
+
         # Prepare order data
         order_data = {
             "amount": amount_in_paise,
@@ -88,32 +170,19 @@ class RazorpayService:
             "receipt": order_uuid,
             "notes": notes or {"order_uuid": order_uuid}
         }
-        
-        try:
-            # Create order via Razorpay API
-            razorpay_order = self.client.order.create(data=order_data)
-            
-            return RazorpayPaymentResponse(
-                razorpay_order_id=razorpay_order["id"],
-                order_uuid=order_uuid,
-                amount=razorpay_order["amount"],
-                currency=razorpay_order["currency"],
-                status=razorpay_order["status"],
-                created_at=razorpay_order["created_at"],
-                key_id=getattr(settings, 'RAZORPAY_KEY_ID', '')
-            )
-            
-        except razorpay.errors.BadRequestError as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Razorpay order creation failed: {str(e)}"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Payment gateway error: {str(e)}"
-            )
-    
+
+        razorpay_order = await self._request("POST", "/orders", json=order_data)
+
+        return RazorpayPaymentResponse(
+            razorpay_order_id=razorpay_order["id"],
+            order_uuid=order_uuid,
+            amount=razorpay_order["amount"],
+            currency=razorpay_order["currency"],
+            status=razorpay_order["status"],
+            created_at=razorpay_order["created_at"],
+            key_id=self.key_id
+        )
+
     def verify_payment_signature(
         self,
         razorpay_order_id: str,
@@ -124,23 +193,18 @@ class RazorpayService:
         Verify Razorpay payment signature
         This ensures the payment callback is authentic
         """
-        
-        if not self.client:
-            return False
-            
-        try:
-            params_dict = {
-                'razorpay_order_id': razorpay_order_id,
-                'razorpay_payment_id': razorpay_payment_id,
-                'razorpay_signature': razorpay_signature
-            }
-            
-            self.client.utility.verify_payment_signature(params_dict)
-            return True
-            
-        except razorpay.errors.SignatureVerificationError:
+
+        if not self.configured:
             return False
-    
+
+        expected_signature = hmac.new(
+            self.key_secret.encode('utf-8'),
+            f"{razorpay_order_id}|{razorpay_payment_id}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+
+        return hmac.compare_digest(expected_signature, razorpay_signature)
+
     def verify_webhook_signature(
         self,
         webhook_body: str,
@@ -149,59 +213,63 @@ class RazorpayService:
         """
         Verify webhook signature from Razorpay
         """
-        
+
         try:
             expected_signature = hmac.new(
                 self.webhook_secret.encode('utf-8'),
                 webhook_body.encode('utf-8'),
                 hashlib.sha256
             ).hexdigest()
-            
+
             return hmac.compare_digest(expected_signature, webhook_signature)
-            
+
         except Exception as e:
             print(f"Webhook signature verification error: {e}")
             return False
-    
-    def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
+
+    async def fetch_order(self, razorpay_order_id: str) -> Dict[str, Any]:
+        """Fetch order details from Razorpay"""
+        return await self._request(
+            "GET", f"/orders/{razorpay_order_id}", idempotent=True,
+            timeout=settings.RAZORPAY_FETCH_TIMEOUT_SECONDS
+        )
+
+    async def fetch_order_payments(self, razorpay_order_id: str) -> Dict[str, Any]:
+        """Fetch payment attempts made against a Razorpay order"""
+        return await self._request(
+            "GET", f"/orders/{razorpay_order_id}/payments", idempotent=True,
+            timeout=settings.RAZORPAY_FETCH_TIMEOUT_SECONDS
+        )
+
+    async def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
         """Fetch payment details from Razorpay"""
-        
-        if not self.client:
-            raise HTTPException(status_code=500, detail="Razorpay not configured")
-            
-        try:
-            return self.client.payment.fetch(payment_id)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to fetch payment: {str(e)}"
-            )
-    
-    def refund_payment(
+        return await self._request(
+            "GET", f"/payments/{payment_id}", idempotent=True,
+            timeout=settings.RAZORPAY_FETCH_TIMEOUT_SECONDS
+        )
+
+    async def refund_payment(
         self,
         payment_id: str,
         amount: Optional[int] = None,
         notes: Optional[Dict[str, str]] = None
     ) -> Dict[str, Any]:
         """Refund a payment (full or partial)"""
-        
-        if not self.client:
-            raise HTTPException(status_code=500, detail="Razorpay not configured")
-        
+
         refund_data = {}
         if amount:
             refund_data["amount"] = amount
         if notes:
             refund_data["notes"] = notes
-        
-        try:
-            return self.client.payment.refund(payment_id, refund_data)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Refund failed: {str(e)}"
-            )
+
+        return await self._request("POST", f"/payments/{payment_id}/refund", json=refund_data)
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.configured,
+            "circuit": self.breaker.stats()
+        }
 
 
-# Singleton instance  
+# Singleton instance
 razorpay_service = RazorpayService()
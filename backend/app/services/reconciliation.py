@@ -0,0 +1,226 @@
+"""
+Payment Reconciliation
+Finds gateway payments still pending locally (e.g. because a webhook was
+lost), asks the gateway what actually happened and applies the outcome
+in bulk.
+
+Run once: python -m app.services.reconciliation
+Point RAZORPAY_API_BASE_URL at a local stand-in server for testing.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_, update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.order import Order
+from app.models.payment import Payment
+from app.services.outbox import enqueue_event
+from app.services.payment_events import publish_payment_status
+from app.services.razorpay_service import razorpay_service
+
+
+class PaymentReconciler:
+    """
+    Scans pending Razorpay payments with keyset pagination and checks
+    them against the gateway with bounded concurrency
+    """
+
+    def __init__(self):
+        self.batch_size = settings.RECONCILIATION_BATCH_SIZE
+        self.concurrency = settings.RECONCILIATION_CONCURRENCY
+        self.grace_seconds = settings.RECONCILIATION_GRACE_SECONDS
+        self.last_report: Optional[dict] = None
+
+    def _load_batch(self, after: Optional[Tuple[datetime, object]]) -> List[dict]:
+        """Next page of pending payments old enough to have missed their webhook"""
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+            query = db.query(
+                Payment.payment_uuid,
+                Payment.order_uuid,
+                Payment.transaction_id,
+                Payment.amount,
+                Payment.created_at,
+                Order.user_uuid
+            ).join(
+                Order, Order.order_uuid == Payment.order_uuid
+            ).filter(
+                Payment.status == "pending",
+                Payment.payment_provider == "razorpay",
+                Payment.transaction_id.isnot(None),
+                Payment.created_at < cutoff
+            )
+            if after is not None:
+                query = query.filter(
+                    tuple_(Payment.created_at, Payment.payment_uuid) > after
+                )
+            rows = query.order_by(
+                Payment.created_at, Payment.payment_uuid
+            ).limit(self.batch_size).all()
+            return [row._asdict() for row in rows]
+        finally:
+            db.close()
+
+    async def _check(self, payment: dict, semaphore: asyncio.Semaphore) -> Tuple[dict, str, Optional[str]]:
+        """Gateway view of one payment: (payment, outcome, gateway_payment_id)"""
+        async with semaphore:
+            try:
+                result = await razorpay_service.fetch_order_payments(payment["transaction_id"])
+            except HTTPException as e:
+                return payment, "error", str(e.detail)
+
+        attempts = result.get("items", [])
+        for attempt in attempts:
+            if attempt.get("status") in ("captured", "refunded"):
+                return payment, "success", attempt.get("id")
+        if attempts and all(attempt.get("status") == "failed" for attempt in attempts):
+            return payment, "failed", attempts[-1].get("id")
+        return payment, "pending", None
+
+    def _apply(self, results: List[Tuple[dict, str, Optional[str]]]) -> Tuple[int, int]:
+        """
+        Apply all transitions for a batch in one transaction
+        Returns how many payments were actually moved to success and failed;
+        a webhook that lands meanwhile wins, and its payment is left alone
+        """
+        succeeded = [(p, ref) for p, outcome, ref in results if outcome == "success"]
+        failed = [p for p, outcome, _ in results if outcome == "failed"]
+        if not succeeded and not failed:
+            return 0, 0
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            paid_orders = []
+            for payment, gateway_payment_id in succeeded:
+                # Guarded on status so a webhook that lands meanwhile wins cleanly
+                updated = db.execute(
+                    update(Payment).where(
+                        Payment.payment_uuid == payment["payment_uuid"],
+                        Payment.status == "pending"
+                    ).values(status="success", upi_txn_id=gateway_payment_id, paid_at=now)
+                ).rowcount
+                if not updated:
+                    continue
+                paid_orders.append(payment["order_uuid"])
+
+                enqueue_event(db, "payment_success", {
+                    "order_uuid": str(payment["order_uuid"]),
+                    "payment_uuid": str(payment["payment_uuid"]),
+                    "payment_id": gateway_payment_id,
+                    "status": "success",
+                    "amount": float(payment["amount"]),
+                    "timestamp": now.isoformat(),
+                    "user_uuid": str(payment["user_uuid"]),
+                    "source": "reconciliation"
+                })
+                publish_payment_status(
+                    db, payment["payment_uuid"], payment["order_uuid"], "success", "paid"
+                )
+
+            if paid_orders:
+                db.execute(
+                    update(Order).where(
+                        Order.order_uuid.in_(paid_orders),
+                        # The money was captured, even if the sweeper expired the order
+                        Order.status.in_(["pending", "payment_failed", "expired"])
+                    ).values(status="paid")
+                )
+
+            failed_rows = []
+            if failed:
+                # Same guard as above: only payments still pending are failed
+                failed_rows = db.execute(
+                    update(Payment).where(
+                        Payment.payment_uuid.in_([p["payment_uuid"] for p in failed]),
+                        Payment.status == "pending"
+                    ).values(status="failed").returning(Payment.payment_uuid, Payment.order_uuid)
+                ).all()
+
+            if failed_rows:
+                db.execute(
+                    update(Order).where(
+                        Order.order_uuid.in_([row.order_uuid for row in failed_rows]),
+                        Order.status == "pending"
+                    ).values(status="payment_failed")
+                )
+                for row in failed_rows:
+                    publish_payment_status(
+                        db, row.payment_uuid, row.order_uuid, "failed", "payment_failed"
+                    )
+
+            db.commit()
+            return len(paid_orders), len(failed_rows)
+        finally:
+            db.close()
+
+    async def reconcile_once(self) -> dict:
+        """One full pass over pending payments; returns a drift report"""
+        started = datetime.utcnow()
+        report = {"checked": 0, "success": 0, "failed": 0, "pending": 0, "error": 0, "drift": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        after = None
+
+        while True:
+            batch = await asyncio.to_thread(self._load_batch, after)
+            if not batch:
+                break
+            after = (batch[-1]["created_at"], batch[-1]["payment_uuid"])
+
+            results = await asyncio.gather(*(self._check(p, semaphore) for p in batch))
+            # Drift counts rows actually corrected, not gateway outcomes
+            applied_success, applied_failed = await asyncio.to_thread(self._apply, results)
+            report["drift"] += applied_success + applied_failed
+
+            report["checked"] += len(results)
+            for _, outcome, _ in results:
+                report[outcome] += 1
+
+        report["started_at"] = started.isoformat()
+        report["duration_seconds"] = round((datetime.utcnow() - started).total_seconds(), 3)
+        self.last_report = report
+
+        if report["drift"] or report["error"]:
+            print(f"🔁 Reconciliation: {report}")
+        return report
+
+    async def run(self):
+        """Periodic background job"""
+        while True:
+            await asyncio.sleep(settings.RECONCILIATION_INTERVAL_SECONDS)
+            if not razorpay_service.configured:
+                continue
+            try:
+                await self.reconcile_once()
+            except Exception as e:
+                print(f"⚠️  Reconciliation failed: {e}")
+
+    def stats(self) -> dict:
+        return {"last_report": self.last_report}
+
+
+payment_reconciler = PaymentReconciler()
+
+
+async def _main():
+    # Register every model so relationships resolve outside the app
+    from app.models.user import User  # noqa: F401
+    from app.models.order_item import OrderItem  # noqa: F401
+    from app.models.exit_qr import ExitQR  # noqa: F401
+    from app.models.product import Product  # noqa: F401
+    from app.models.cart import Cart  # noqa: F401
+    from app.core.http_clients import http_clients
+    try:
+        report = await payment_reconciler.reconcile_once()
+        print(report)
+    finally:
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
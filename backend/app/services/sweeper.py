@@ -0,0 +1,182 @@
+"""
+Expiry Sweeper
+Expires abandoned orders and deletes rows nothing will read again
+(expired exit passes, stale carts, old queue and dedupe records) so
+tables and their hot indexes stay small.
+
+Work happens in bounded batches using the ctid IN (SELECT ... LIMIT n)
+pattern. Each batch takes a transaction-scoped advisory lock for its
+table, so several nodes can run the sweeper without stepping on each other.
+"""
+
+import asyncio
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.qr_cache import qr_image_cache
+
+
+class SweepTask:
+    """One bounded UPDATE/DELETE ... WHERE ctid IN (SELECT ... LIMIT :limit)"""
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = text(sql)
+        # Stable advisory lock key per task, shared by every node
+        self.lock_key = zlib.crc32(f"sweeper:{name}".encode("utf-8"))
+
+
+TASKS = [
+    # Pending orders past their checkout window, unless a Razorpay payment is
+    # still in flight; the reconciler settles those. Providers it can't query
+    # (demo) get no exemption, so a dropped webhook can't pin the order
+    # pending forever. Late payment webhooks still
+    # mark them paid. Orders only check stock and never reserve it, so
+    # there is nothing to release here.
+    SweepTask("expire_orders", """
+        UPDATE orders SET status = 'expired', updated_at = :now
+        WHERE ctid IN (
+            SELECT ctid FROM orders
+            WHERE status = 'pending' AND expires_at < :now
+              AND NOT EXISTS (
+                  SELECT 1 FROM payments p
+                  WHERE p.order_uuid = orders.order_uuid AND p.status = 'pending'
+                    AND p.payment_provider = 'razorpay'
+              )
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING order_uuid
+    """),
+    # Unused passes that expired a while ago; used ones stay as the exit record
+    SweepTask("delete_expired_passes", """
+        DELETE FROM exit_qrs
+        WHERE ctid IN (
+            SELECT ctid FROM exit_qrs
+            WHERE used = false AND expires_at < :retention_cutoff
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING token_hash, qr_image_path
+    """),
+    SweepTask("delete_stale_carts", """
+        DELETE FROM carts
+        WHERE ctid IN (
+            SELECT ctid FROM carts
+            WHERE updated_at < :cart_cutoff
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING cart_uuid
+    """),
+    SweepTask("delete_processed_webhooks", """
+        DELETE FROM webhook_inbox
+        WHERE ctid IN (
+            SELECT ctid FROM webhook_inbox
+            WHERE status = 'processed' AND processed_at < :retention_cutoff
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+    """),
+    SweepTask("delete_delivered_outbox", """
+        DELETE FROM outbox_events
+        WHERE ctid IN (
+            SELECT ctid FROM outbox_events
+            WHERE status = 'delivered' AND delivered_at < :retention_cutoff
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING event_uuid
+    """),
+    # Gateways stop retrying long before the retention window ends
+    SweepTask("delete_old_webhook_ids", """
+        DELETE FROM processed_webhook_events
+        WHERE ctid IN (
+            SELECT ctid FROM processed_webhook_events
+            WHERE received_at < :retention_cutoff
+            LIMIT :limit FOR UPDATE SKIP LOCKED
+        )
+        RETURNING event_id
+    """),
+]
+
+
+class ExpirySweeper:
+    """
+    Periodic, multi-node safe cleanup of expired and finished rows
+    """
+
+    def __init__(self, tasks: List[SweepTask]):
+        self.tasks = tasks
+        self.batch_size = settings.SWEEPER_BATCH_SIZE
+        self.max_batches = settings.SWEEPER_MAX_BATCHES
+        self.totals: Dict[str, int] = {task.name: 0 for task in tasks}
+        self.last_run: Optional[dict] = None
+
+    def _run_batch(self, task: SweepTask, params: dict) -> Optional[list]:
+        """One batch in its own transaction; None if another node holds the task"""
+        db = SessionLocal()
+        try:
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": task.lock_key}
+            ).scalar()
+            if not locked:
+                db.rollback()
+                return None
+
+            rows = db.execute(task.sql, {**params, "limit": self.batch_size}).all()
+            db.commit()
+            return rows
+        finally:
+            db.close()
+
+    def sweep_once(self) -> dict:
+        """Run every task until it runs dry or hits max_batches; runs off the event loop"""
+        now = datetime.utcnow()
+        params = {
+            "now": now,
+            "retention_cutoff": now - timedelta(hours=settings.SWEEPER_RETENTION_HOURS),
+            "cart_cutoff": now - timedelta(hours=settings.CART_TTL_HOURS)
+        }
+
+        report = {}
+        for task in self.tasks:
+            swept = 0
+            for _ in range(self.max_batches):
+                rows = self._run_batch(task, params)
+                if rows is None:
+                    break
+                swept += len(rows)
+
+                if task.name == "delete_expired_passes":
+                    for row in rows:
+                        qr_image_cache.evict(row.token_hash, row.qr_image_path)
+
+                if len(rows) < self.batch_size:
+                    break
+
+            report[task.name] = swept
+            self.totals[task.name] += swept
+
+        self.last_run = {"at": now.isoformat(), **report}
+        if any(report.values()):
+            print(f"🧹 Sweeper: {report}")
+        return report
+
+    async def run(self):
+        """Background loop started with the application"""
+        while True:
+            await asyncio.sleep(settings.SWEEPER_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.sweep_once)
+            except Exception as e:
+                print(f"⚠️  Sweeper run failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "totals": self.totals,
+            "last_run": self.last_run
+        }
+
+
+expiry_sweeper = ExpirySweeper(TASKS)
@@ -0,0 +1,74 @@
+"""
+Webhook Deduplication
+Gateways retry webhooks aggressively; duplicates are answered from an
+in-memory set of recent event ids, and the processed_webhook_events
+table catches any that reach a different worker
+"""
+
+import threading
+from collections import OrderedDict
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.processed_webhook_event import ProcessedWebhookEvent
+
+
+class WebhookDeduplicator:
+    """
+    Recent event ids (bounded LRU) in front of a unique DB table
+    """
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+
+    def seen(self, event_id: str) -> bool:
+        """Cheap check before any DB work"""
+        with self._lock:
+            if event_id in self._recent:
+                self._recent.move_to_end(event_id)
+                self.memory_hits += 1
+                return True
+        return False
+
+    def remember(self, event_id: str) -> None:
+        """Record an event id once its processing has been committed"""
+        with self._lock:
+            self._recent[event_id] = None
+            self._recent.move_to_end(event_id)
+            while len(self._recent) > self.max_size:
+                self._recent.popitem(last=False)
+
+    def claim(self, db: Session, event_id: str, provider: str) -> bool:
+        """
+        Insert the event id inside the caller's transaction
+        Returns False if another delivery already committed it; a concurrent
+        uncommitted claim makes this block until that transaction finishes,
+        so the event is processed exactly once
+        """
+        stmt = insert(ProcessedWebhookEvent).values(
+            event_id=event_id,
+            provider=provider
+        ).on_conflict_do_nothing(
+            index_elements=[ProcessedWebhookEvent.event_id]
+        ).returning(ProcessedWebhookEvent.event_id)
+
+        claimed = db.execute(stmt).scalar() is not None
+        if not claimed:
+            self.db_hits += 1
+            self.remember(event_id)
+        return claimed
+
+    def stats(self) -> dict:
+        return {
+            "recent": len(self._recent),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits
+        }
+
+
+webhook_deduplicator = WebhookDeduplicator(max_size=settings.WEBHOOK_DEDUPE_CACHE_SIZE)
@@ -0,0 +1,207 @@
+"""
+Webhook Queue
+The webhook endpoint only verifies, stores the raw event and acks;
+workers drain the queue afterwards, in arrival order per order_uuid.
+Events are applied on a dedicated thread pool, so slow database work
+never blocks the event loop serving the webhook endpoint
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import exists, func, or_
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.webhook_inbox import WebhookInbox
+
+
+class WebhookQueue:
+    """
+    Durable webhook queue backed by the webhook_inbox table
+    An event is only claimable once every earlier event for the same
+    order has finished, so per-order ordering holds across workers and nodes
+    """
+
+    def __init__(self):
+        self.workers = settings.WEBHOOK_QUEUE_WORKERS
+        self.batch_size = settings.WEBHOOK_QUEUE_BATCH_SIZE
+        self.poll_seconds = settings.WEBHOOK_QUEUE_POLL_SECONDS
+        self.max_attempts = settings.WEBHOOK_QUEUE_MAX_ATTEMPTS
+        self.lease_seconds = 60
+        self._processor: Optional[Callable[[Session, str, Optional[str], dict], Any]] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="webhook-queue"
+        )
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.depth = 0
+        self.lag_seconds = 0.0
+        self.processed = 0
+        self.failed = 0
+
+    def set_processor(self, processor: Callable[[Session, str, Optional[str], dict], Any]):
+        """Register the blocking function that applies one event: (db, provider, event_id, data)"""
+        self._processor = processor
+
+    def enqueue(
+        self,
+        db: Session,
+        provider: str,
+        body: str,
+        event_id: Optional[str] = None,
+        order_uuid: Optional[str] = None
+    ) -> WebhookInbox:
+        """Durably store a verified raw event"""
+        item = WebhookInbox(
+            provider=provider,
+            event_id=event_id,
+            order_uuid=order_uuid,
+            body=body
+        )
+        db.add(item)
+        db.commit()
+        self.wake()
+        return item
+
+    def wake(self):
+        if self._wake_event is not None:
+            # Safe from worker threads as well as the event loop
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    def _claim_batch(self) -> List[dict]:
+        """Lease the next processable event of each order; runs off the event loop"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            earlier = aliased(WebhookInbox)
+            blocked = exists().where(
+                earlier.order_uuid == WebhookInbox.order_uuid,
+                earlier.status == "pending",
+                earlier.id < WebhookInbox.id
+            )
+
+            items = db.query(WebhookInbox).filter(
+                WebhookInbox.status == "pending",
+                WebhookInbox.next_attempt_at <= now,
+                or_(WebhookInbox.order_uuid.is_(None), ~blocked)
+            ).order_by(
+                WebhookInbox.id
+            ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            claimed = []
+            for item in items:
+                item.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+                item.attempts += 1
+                claimed.append({
+                    "id": item.id,
+                    "provider": item.provider,
+                    "event_id": item.event_id,
+                    "body": item.body,
+                    "attempts": item.attempts
+                })
+            db.commit()
+
+            depth, oldest = db.query(
+                func.count(WebhookInbox.id),
+                func.min(WebhookInbox.received_at)
+            ).filter(WebhookInbox.status == "pending").one()
+            self.depth = depth
+            self.lag_seconds = (now - oldest).total_seconds() if oldest else 0.0
+
+            return claimed
+        finally:
+            db.close()
+
+    def _finish(self, item_id: int, error: Optional[str], permanent: bool, attempts: int):
+        """Mark an event processed, failed, or due for retry"""
+        db = SessionLocal()
+        try:
+            item = db.query(WebhookInbox).filter(WebhookInbox.id == item_id).first()
+            if item is None:
+                return
+
+            now = datetime.utcnow()
+            if error is None:
+                item.status = "processed"
+                item.processed_at = now
+                item.last_error = None
+            elif permanent or attempts >= self.max_attempts:
+                item.status = "failed"
+                item.last_error = error
+            else:
+                item.next_attempt_at = now + timedelta(seconds=min(300, 2 ** attempts))
+                item.last_error = error
+            db.commit()
+        finally:
+            db.close()
+
+    def _apply(self, item: dict) -> Tuple[Optional[str], bool]:
+        """Run the processor for one event; runs on the queue's thread pool"""
+        error, permanent = None, False
+        db = SessionLocal()
+        try:
+            self._processor(
+                db, item["provider"], item["event_id"], json.loads(item["body"])
+            )
+        except HTTPException as e:
+            # Client errors (unknown order, bad payload) won't succeed on retry
+            error, permanent = str(e.detail), e.status_code < 500
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            db.close()
+
+        self._finish(item["id"], error, permanent, item["attempts"])
+        return error, permanent
+
+    async def _process(self, item: dict):
+        error, _ = await self._loop.run_in_executor(self._executor, self._apply, item)
+        if error is None:
+            self.processed += 1
+        else:
+            self.failed += 1
+            print(f"⚠️  Webhook {item['id']} processing failed: {error}")
+
+    async def drain_once(self) -> int:
+        items = await asyncio.to_thread(self._claim_batch)
+        if items:
+            # Claimed items belong to distinct orders, so they can run
+            # concurrently, up to WEBHOOK_QUEUE_WORKERS at a time
+            await asyncio.gather(*(self._process(item) for item in items))
+        return len(items)
+
+    async def run(self):
+        """Background loop started with the application"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        while True:
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                print(f"⚠️  Webhook queue drain failed: {e}")
+                drained = 0
+
+            if drained:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "lag_seconds": round(self.lag_seconds, 3),
+            "processed": self.processed,
+            "failed": self.failed
+        }
+
+
+webhook_queue = WebhookQueue()
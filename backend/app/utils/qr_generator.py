@@ -1,38 +1,61 @@
 import qrcode
+from qrcode.image.svg import SvgPathImage
 from io import BytesIO
 import base64
 from pathlib import Path
 from typing import Optional
 
-def generate_qr_code(data: str, save_path: Optional[str] = None) -> str:
-    """
-    Generate QR code from data
-    Returns base64 encoded image string
-    """
+def _build_qr(data: str, box_size: int, border: int) -> qrcode.QRCode:
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        box_size=box_size,
+        border=border,
     )
     
     qr.add_data(data)
     qr.make(fit=True)
+    return qr
+
+def render_qr_png(data: str, box_size: int = 10, border: int = 4) -> bytes:
+    """
+    Render QR code for data as raw PNG bytes
+    """
+    img = _build_qr(data, box_size, border).make_image(fill_color="black", back_color="white")
     
-    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def render_qr_svg(data: str, box_size: int = 10, border: int = 4) -> bytes:
+    """
+    Render QR code for data as a compact single-path SVG
+    """
+    img = _build_qr(data, box_size, border).make_image(image_factory=SvgPathImage)
+    
+    buffer = BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+def png_data_uri(png: bytes) -> str:
+    """Embed PNG bytes as a base64 data URI"""
+    img_base64 = base64.b64encode(png).decode('utf-8')
+    return f"data:image/png;base64,{img_base64}"
+
+def generate_qr_code(data: str, save_path: Optional[str] = None) -> str:
+    """
+    Generate QR code from data
+    Returns base64 encoded image string
+    """
+    png = render_qr_png(data)
     
     # Save to file if path provided
     if save_path:
         Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        img.save(save_path)
+        Path(save_path).write_bytes(png)
     
     # Convert to base64 for API response
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    
-    return f"data:image/png;base64,{img_base64}"
+    return png_data_uri(png)
 
 def generate_product_qr(product_uuid: str, product_name: str) -> str:
     """Generate QR code for product scanning"""
@@ -20,6 +20,10 @@ from app.models.order_item import OrderItem
 from app.models.payment import Payment
 from app.models.exit_qr import ExitQR
 from app.models.staff import Staff
+from app.models.revoked_token import RevokedToken
+from app.models.outbox_event import OutboxEvent
+from app.models.processed_webhook_event import ProcessedWebhookEvent
+from app.models.webhook_inbox import WebhookInbox
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
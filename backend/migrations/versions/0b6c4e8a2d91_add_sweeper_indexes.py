@@ -0,0 +1,33 @@
+"""Add indexes used by the expiry sweeper
+
+Revision ID: 0b6c4e8a2d91
+Revises: f2a8d61c5e73
+Create Date: 2026-10-18 15:02:44.183906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6c4e8a2d91'
+down_revision: Union[str, Sequence[str], None] = 'f2a8d61c5e73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_orders_pending_expires_at', 'orders', ['expires_at'],
+        unique=False, postgresql_where=sa.text("status = 'pending'")
+    )
+    op.create_index(op.f('ix_carts_updated_at'), 'carts', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_carts_updated_at'), table_name='carts')
+    op.drop_index('ix_orders_pending_expires_at', table_name='orders')
@@ -0,0 +1,28 @@
+"""Add gate display snapshot to exit passes
+
+Revision ID: 1d7f3b5a9c24
+Revises: 0b6c4e8a2d91
+Create Date: 2026-10-18 15:41:19.640357
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d7f3b5a9c24'
+down_revision: Union[str, Sequence[str], None] = '0b6c4e8a2d91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exit_qrs', sa.Column('display_data', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('exit_qrs', 'display_data')
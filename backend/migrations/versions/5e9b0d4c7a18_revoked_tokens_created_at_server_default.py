@@ -0,0 +1,38 @@
+"""Default revoked_tokens.created_at to the database clock
+
+Revision ID: 5e9b0d4c7a18
+Revises: 1d7f3b5a9c24
+Create Date: 2026-10-18 16:22:04.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b0d4c7a18'
+down_revision: Union[str, Sequence[str], None] = '1d7f3b5a9c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'revoked_tokens', 'created_at',
+        existing_type=sa.DateTime(),
+        existing_nullable=False,
+        server_default=sa.text("timezone('utc', now())")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'revoked_tokens', 'created_at',
+        existing_type=sa.DateTime(),
+        existing_nullable=False,
+        server_default=None
+    )
@@ -0,0 +1,45 @@
+"""Add outbox events
+
+Revision ID: 7b2e5f0c9a13
+Revises: 3c7a1d9e4b21
+Create Date: 2026-10-18 11:03:27.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e5f0c9a13'
+down_revision: Union[str, Sequence[str], None] = '3c7a1d9e4b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outbox_events',
+        sa.Column('event_uuid', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('event_uuid')
+    )
+    op.create_index(op.f('ix_outbox_events_status'), 'outbox_events', ['status'], unique=False)
+    op.create_index(op.f('ix_outbox_events_next_attempt_at'), 'outbox_events', ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_outbox_events_next_attempt_at'), table_name='outbox_events')
+    op.drop_index(op.f('ix_outbox_events_status'), table_name='outbox_events')
+    op.drop_table('outbox_events')
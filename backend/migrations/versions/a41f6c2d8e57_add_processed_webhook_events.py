@@ -0,0 +1,36 @@
+"""Add processed webhook events
+
+Revision ID: a41f6c2d8e57
+Revises: 7b2e5f0c9a13
+Create Date: 2026-10-18 11:48:09.162534
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c2d8e57'
+down_revision: Union[str, Sequence[str], None] = '7b2e5f0c9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'processed_webhook_events',
+        sa.Column('event_id', sa.String(length=255), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_processed_webhook_events_received_at'), 'processed_webhook_events', ['received_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_processed_webhook_events_received_at'), table_name='processed_webhook_events')
+    op.drop_table('processed_webhook_events')
@@ -0,0 +1,46 @@
+"""Add webhook inbox
+
+Revision ID: c58d0e3f7b92
+Revises: a41f6c2d8e57
+Create Date: 2026-10-18 12:21:53.730418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58d0e3f7b92'
+down_revision: Union[str, Sequence[str], None] = 'a41f6c2d8e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'webhook_inbox',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('event_id', sa.String(length=255), nullable=True),
+        sa.Column('order_uuid', sa.String(length=64), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_webhook_inbox_order_uuid'), 'webhook_inbox', ['order_uuid'], unique=False)
+    op.create_index(op.f('ix_webhook_inbox_status'), 'webhook_inbox', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_webhook_inbox_status'), table_name='webhook_inbox')
+    op.drop_index(op.f('ix_webhook_inbox_order_uuid'), table_name='webhook_inbox')
+    op.drop_table('webhook_inbox')
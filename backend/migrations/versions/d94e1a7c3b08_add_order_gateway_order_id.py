@@ -0,0 +1,30 @@
+"""Add prepared gateway order to orders
+
+Revision ID: d94e1a7c3b08
+Revises: c58d0e3f7b92
+Create Date: 2026-10-18 13:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd94e1a7c3b08'
+down_revision: Union[str, Sequence[str], None] = 'c58d0e3f7b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('gateway_order_id', sa.String(length=255), nullable=True))
+    op.add_column('orders', sa.Column('gateway_order_amount', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('orders', 'gateway_order_amount')
+    op.drop_column('orders', 'gateway_order_id')
@@ -0,0 +1,28 @@
+"""Index exit_qrs.used_at for gate sync
+
+Revision ID: e3b7c2a9f416
+Revises: d94e1a7c3b08
+Create Date: 2026-10-18 13:48:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7c2a9f416'
+down_revision: Union[str, Sequence[str], None] = 'd94e1a7c3b08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_exit_qrs_used_at'), 'exit_qrs', ['used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_exit_qrs_used_at'), table_name='exit_qrs')
@@ -0,0 +1,43 @@
+"""Look up exit passes by token digest
+
+Revision ID: f2a8d61c5e73
+Revises: e3b7c2a9f416
+Create Date: 2026-10-18 14:12:05.551870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8d61c5e73'
+down_revision: Union[str, Sequence[str], None] = 'e3b7c2a9f416'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exit_qrs', sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+
+    # Backfill with the same sha256 the application computes (PostgreSQL 11+)
+    op.execute("UPDATE exit_qrs SET token_hash = sha256(convert_to(token, 'UTF8'))")
+
+    op.alter_column('exit_qrs', 'token_hash', nullable=False)
+    op.create_index(op.f('ix_exit_qrs_token_hash'), 'exit_qrs', ['token_hash'], unique=True)
+
+    # The raw token is no longer a lookup key
+    op.execute("ALTER TABLE exit_qrs DROP CONSTRAINT IF EXISTS exit_qrs_token_key")
+    op.execute("DROP INDEX IF EXISTS ix_exit_qrs_token")
+    op.alter_column('exit_qrs', 'token', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM exit_qrs WHERE token IS NULL")
+    op.alter_column('exit_qrs', 'token', existing_type=sa.Text(), nullable=False)
+    op.create_index(op.f('ix_exit_qrs_token'), 'exit_qrs', ['token'], unique=True)
+    op.drop_index(op.f('ix_exit_qrs_token_hash'), table_name='exit_qrs')
+    op.drop_column('exit_qrs', 'token_hash')